@@ -1,12 +1,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-import json
+import os
+import time
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 
+from batch_scoring import OUTPUT_TTL_SECONDS, new_output_path, prune_outputs, score_file
+from dataset_io import load_dataset
+from fast_scorer import load_serving_model, model_version
+from feature_encoder import FeatureEncoder
+from prediction_cache import PredictionCache
+from risk_surface import SIM_AXES, load_surface
+from thresholds import RiskBands
+
 # Page config
 st.set_page_config(
     page_title="Fall Risk Assessment AI",
@@ -18,15 +26,28 @@ st.set_page_config(
 # Load model artifacts
 @st.cache_resource
 def load_model():
-    model = joblib.load('models/fall_risk_model.pkl')
-    scaler = joblib.load('models/scaler.pkl')
-    with open('models/feature_names.json', 'r') as f:
-        feature_names = json.load(f)
-    with open('models/metadata.json', 'r') as f:
-        metadata = json.load(f)
-    return model, scaler, feature_names, metadata
+    # Memory-mapped model bundle when exported, separate artifacts otherwise
+    scorer, metadata = load_serving_model('models')
+    encoder = FeatureEncoder(scorer.feature_names)
+    # Calibration map and band cut-offs fitted at training time
+    bands = RiskBands.from_metadata(metadata)
+    return scorer, scorer.feature_names, metadata, encoder, bands, model_version(scorer, metadata)
+
+scorer, feature_names, metadata, encoder, bands, version = load_model()
+
+# One prediction cache per server process, shared by every session and thread;
+# keys include the model version, so a retrained model never sees stale entries
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(max_entries=10_000)
+
+prediction_cache = get_prediction_cache()
 
-model, scaler, feature_names, metadata = load_model()
+# Simulator grid scored once per model version (and cached on disk across restarts)
+# when that is cheap or already done; tree models score slider positions on demand
+@st.cache_resource(show_spinner="Loading the risk simulator...")
+def load_risk_surface(version):
+    return load_surface('models/risk_surface', version, scorer, encoder, bands)
 
 # Enhanced CSS with animations
 st.markdown("""
@@ -255,7 +276,7 @@ with st.sidebar:
     """)
 
 # Main content with tabs
-tab1, tab2, tab3, tab4 = st.tabs(["🔍 Live Assessment", "📊 Risk Factors", "📈 Analytics", "ℹ️ Information"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔍 Live Assessment", "📊 Risk Factors", "📈 Analytics", "📦 Batch Scoring", "ℹ️ Information"])
 
 with tab1:
     st.header("🏥 Patient Fall Risk Assessment")
@@ -402,25 +423,23 @@ with tab1:
         st.markdown("---")
         st.markdown("## 🎯 ASSESSMENT RESULTS")
         
-        # Get prediction
-        input_df = pd.DataFrame([st.session_state.patient_data])
-        input_scaled = scaler.transform(input_df)
-        prediction = model.predict(input_scaled)[0]
-        probability = model.predict_proba(input_scaled)[0][1]
+        # Get prediction (reruns and identical profiles from other sessions hit the cache)
+        x = encoder.encode(st.session_state.patient_data)[0]
+        probability = prediction_cache.get_or_compute(
+            version, x, lambda: bands.calibrate(scorer.predict_risk(x))
+        )
         
         # Risk category
-        if probability < 0.3:
-            risk_category = "Low"
+        risk_category = bands.label('risk', probability)
+        if risk_category == "Low":
             risk_color = "#56ab2f"
             risk_class = "risk-low"
             risk_emoji = "✅"
-        elif probability < 0.6:
-            risk_category = "Medium"
+        elif risk_category == "Medium":
             risk_color = "#f2994a"
             risk_class = "risk-medium"
             risk_emoji = "⚠️"
         else:
-            risk_category = "High"
             risk_color = "#eb3349"
             risk_class = "risk-high"
             risk_emoji = "🚨"
@@ -457,7 +476,7 @@ with tab1:
             """, unsafe_allow_html=True)
         
         with col4:
-            urgency = "Immediate" if probability > 0.7 else "Soon" if probability > 0.4 else "Routine"
+            urgency = bands.label('urgency', probability)
             st.markdown(f"""
             <div class="metric-card">
                 <h3 style="margin:0;">⏰ Urgency</h3>
@@ -469,6 +488,7 @@ with tab1:
         st.markdown("<br>", unsafe_allow_html=True)
         
         # Interactive Gauge Chart
+        low_cut, high_cut = bands.cutoffs['risk'] * 100
         fig = go.Figure(go.Indicator(
             mode = "gauge+number+delta",
             value = probability * 100,
@@ -483,9 +503,9 @@ with tab1:
                 'borderwidth': 3,
                 'bordercolor': "gray",
                 'steps': [
-                    {'range': [0, 30], 'color': '#d4edda'},
-                    {'range': [30, 60], 'color': '#fff3cd'},
-                    {'range': [60, 100], 'color': '#f8d7da'}
+                    {'range': [0, low_cut], 'color': '#d4edda'},
+                    {'range': [low_cut, high_cut], 'color': '#fff3cd'},
+                    {'range': [high_cut, 100], 'color': '#f8d7da'}
                 ],
                 'threshold': {
                     'line': {'color': "darkred", 'width': 6},
@@ -639,9 +659,16 @@ with tab2:
     
     st.info("**Interactive visualization of how different factors influence fall risk**")
     
-    # Feature importance if available
-    if hasattr(model, 'coef_'):
-        importance = np.abs(model.coef_[0])
+    # Permutation importance computed at training time (any model type);
+    # |coef| for artifacts trained before it was stored
+    permutation = metadata.get('permutation_importance', {})
+    importance = None
+    if permutation.get('feature_names') == feature_names and metadata['model_type'] in permutation['models']:
+        importance = np.array(permutation['models'][metadata['model_type']]['mean'])
+    elif scorer.coef is not None:
+        importance = np.abs(scorer.coef)
+    
+    if importance is not None:
         feature_importance_df = pd.DataFrame({
             'Feature': feature_names,
             'Importance': importance
@@ -682,6 +709,8 @@ with tab2:
         }
         for key, value in scenario_a.items():
             st.markdown(f"- **{key.replace('_', ' ').title()}:** {value}")
+        scenario_a_prob = load_risk_surface(version).probability(**scenario_a)
+        st.metric("Simulated Risk", f"{scenario_a_prob*100:.1f}%")
     
     with col2:
         st.markdown("### Scenario B: High Risk Profile")
@@ -695,6 +724,8 @@ with tab2:
         }
         for key, value in scenario_b.items():
             st.markdown(f"- **{key.replace('_', ' ').title()}:** {value}")
+        scenario_b_prob = load_risk_surface(version).probability(**scenario_b)
+        st.metric("Simulated Risk", f"{scenario_b_prob*100:.1f}%")
     
     # Interactive risk simulator
     st.markdown("---")
@@ -715,39 +746,25 @@ with tab2:
         sim_meds = st.slider("Sim: Medications", 0, 15, 3, key="sim_meds")
         sim_activity = st.slider("Sim: Activity", 0.0, 10.0, 5.0, 0.5, key="sim_activity")
     
-    # Calculate simulation risk
-    sim_data = {
+    # Look up the simulation risk on the simulator surface
+    surface = load_risk_surface(version)
+    sim_inputs = {
         'age': sim_age,
-        'bmi': 27.0,
         'gait_speed': sim_gait,
         'balance_score': sim_balance,
-        'muscle_strength': 5.0,
         'previous_falls': sim_falls,
         'num_medications': sim_meds,
-        'takes_sedatives': 0,
-        'takes_blood_pressure_meds': 0,
-        'has_arthritis': 0,
-        'has_osteoporosis': 0,
-        'has_parkinsons': 0,
-        'has_diabetes': 0,
-        'vision_impairment': 0,
-        'cognitive_score': 7.0,
-        'uses_walking_aid': 0,
-        'lives_alone': 0,
-        'home_hazards': 2,
-        'activity_level': sim_activity,
-        'gender_male': 1
+        'activity_level': sim_activity
     }
     
-    sim_df = pd.DataFrame([sim_data])
-    sim_scaled = scaler.transform(sim_df)
-    sim_prob = model.predict_proba(sim_scaled)[0][1]
+    sim_prob = surface.probability(**sim_inputs)
+    risk_cat = surface.label('risk', sim_prob)
     
     # Display simulation result
     st.markdown("### 🎯 Simulated Risk Result")
     
     # Create a gradient progress bar
-    progress_color = "#56ab2f" if sim_prob < 0.3 else "#f2994a" if sim_prob < 0.6 else "#eb3349"
+    progress_color = {"Low": "#56ab2f", "Medium": "#f2994a", "High": "#eb3349"}[risk_cat]
     
     st.markdown(f"""
     <div class="progress-bar">
@@ -757,15 +774,49 @@ with tab2:
     </div>
     """, unsafe_allow_html=True)
     
-    risk_cat = "Low" if sim_prob < 0.3 else "Medium" if sim_prob < 0.6 else "High"
     st.markdown(f"**Risk Category:** {risk_cat}")
+    
+    # Sensitivity heatmap: two inputs varied, the other four held at the sliders
+    st.markdown("### 🗺️ Sensitivity Heatmap")
+    axis_names = list(SIM_AXES)
+    axis_labels = {name: name.replace('_', ' ').title() for name in axis_names}
+    
+    heat_col1, heat_col2 = st.columns(2)
+    with heat_col1:
+        heat_x = st.selectbox("X axis", axis_names, index=axis_names.index('gait_speed'),
+                              format_func=axis_labels.get, key="heat_x")
+    with heat_col2:
+        y_options = [name for name in axis_names if name != heat_x]
+        heat_y = st.selectbox("Y axis", y_options,
+                              index=y_options.index('balance_score') if 'balance_score' in y_options else 0,
+                              format_func=axis_labels.get, key="heat_y")
+    
+    y_values, x_values, grid = surface.slice(heat_x, heat_y, **sim_inputs)
+    fig = px.imshow(
+        grid * 100,
+        x=x_values,
+        y=y_values,
+        origin='lower',
+        aspect='auto',
+        color_continuous_scale=[[0, '#56ab2f'], [0.5, '#f2994a'], [1, '#eb3349']],
+        range_color=[0, 100],
+        labels={'x': axis_labels[heat_x], 'y': axis_labels[heat_y], 'color': 'Risk %'},
+        title=f"Fall Risk by {axis_labels[heat_x]} and {axis_labels[heat_y]}"
+    )
+    fig.add_trace(go.Scatter(
+        x=[sim_inputs[heat_x]], y=[sim_inputs[heat_y]],
+        mode='markers', marker=dict(symbol='x', size=14, color='black'),
+        name='Current', showlegend=False
+    ))
+    fig.update_layout(height=500)
+    st.plotly_chart(fig, use_container_width=True)
 
 with tab3:
     st.header("📈 Population Analytics")
     
     # Load test data for analytics
     try:
-        test_df = pd.read_csv('data/fall_risk_test.csv')
+        test_df = load_dataset('data/fall_risk_test.csv')
         
         st.subheader("📊 Risk Distribution in Test Population")
         
@@ -836,6 +887,83 @@ with tab3:
         st.warning("Test data not available for analytics")
 
 with tab4:
+    st.header("📦 Batch Scoring")
+    st.markdown("""
+    Upload a CSV or Parquet file of patients in the training schema (one row per patient).
+    Rows are validated, encoded and scored in chunks, and the scored file is written to disk
+    as it goes, so files with millions of patients never sit in memory.
+    """)
+    
+    # Scored files of abandoned sessions expire after an hour
+    prune_outputs()
+    
+    uploaded = st.file_uploader("Patient file", type=['csv', 'parquet'])
+    
+    if uploaded is not None and st.button("🚀 Score File", type="primary"):
+        previous = st.session_state.get('batch_result')
+        if previous is not None and os.path.exists(previous['path']):
+            os.remove(previous['path'])
+        st.session_state.batch_result = None
+        
+        output_path = new_output_path()
+        progress_bar = st.progress(0.0, text="Scoring...")
+        
+        def show_progress(n_rows, fraction):
+            progress_bar.progress(min(fraction or 0.0, 1.0), text=f"Scored {n_rows:,} patients")
+        
+        start = time.perf_counter()
+        try:
+            summary = score_file(uploaded, uploaded.name, output_path, scorer, encoder, bands,
+                                 progress=show_progress)
+        except ValueError as e:
+            os.remove(output_path)
+            st.error(f"⚠️ Could not score this file: {e}")
+        else:
+            summary['seconds'] = time.perf_counter() - start
+            st.session_state.batch_result = {
+                'path': output_path,
+                'file_name': os.path.splitext(uploaded.name)[0] + '_scored.csv.gz',
+                'summary': summary
+            }
+    
+    result = st.session_state.get('batch_result')
+    if result is not None and not os.path.exists(result['path']):
+        st.info(f"ℹ️ The scored file expired after {OUTPUT_TTL_SECONDS // 60} minutes; score the file again to download it.")
+    elif result is not None:
+        summary = result['summary']
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Patients Scored", f"{summary['n_rows'] - summary['n_invalid']:,}")
+        with col2:
+            st.metric("Invalid Rows", f"{summary['n_invalid']:,}")
+        with col3:
+            st.metric("Throughput", f"{summary['n_rows'] / max(summary['seconds'], 1e-9):,.0f} rows/s")
+        
+        if summary['n_invalid']:
+            st.warning(f"⚠️ {summary['n_invalid']:,} row(s) had missing, malformed or out-of-range values and were left unscored")
+        
+        fig = px.bar(
+            x=list(summary['risk_bands']),
+            y=list(summary['risk_bands'].values()),
+            color=list(summary['risk_bands']),
+            color_discrete_map={'Low': '#56ab2f', 'Medium': '#f2994a', 'High': '#eb3349'},
+            labels={'x': 'Risk Band', 'y': 'Patients'},
+            title="Scored Patients by Risk Band"
+        )
+        fig.update_layout(height=400, showlegend=False)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        with open(result['path'], 'rb') as f:
+            st.download_button(
+                "⬇️ Download Scored File",
+                f,
+                file_name=result['file_name'],
+                mime='application/gzip'
+            )
+        st.caption("Columns: patient_id (when present), probability (calibrated), risk_band, urgency")
+
+with tab5:
     st.header("ℹ️ System Information")
     
     col1, col2 = st.columns(2)
@@ -937,6 +1065,18 @@ with tab4:
     - Cross-validation: 5-fold
     """)
 
+# Prediction cache counters (shared across all sessions), added to the sidebar
+# last so they include this run's lookup
+with st.sidebar:
+    cache_stats = prediction_cache.stats()
+    st.subheader("⚡ Prediction Cache")
+    hit_rate = f"{cache_stats['hit_rate']*100:.0f}%" if cache_stats['hit_rate'] is not None else "–"
+    st.markdown(f"""
+    - **Hit Rate:** {hit_rate}
+    - **Hits / Misses:** {cache_stats['hits']} / {cache_stats['misses']}
+    - **Entries:** {cache_stats['entries']} / {cache_stats['max_entries']}
+    """)
+
 # Footer
 st.markdown("---")
 st.markdown(
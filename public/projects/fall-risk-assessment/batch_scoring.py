@@ -0,0 +1,238 @@
+import gzip
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_encoder import FEATURE_SOURCES
+from thresholds import BAND_LABELS
+
+# Rows validated, encoded and scored together
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Input columns copied through to the scored file when present
+PASSTHROUGH_COLUMNS = ['patient_id']
+
+GENDERS = ['Female', 'Male']
+
+# Accepted (low, high, whole numbers only) per numeric column: the assessment
+# form's ranges, which the generators clip to as well. Anything else is
+# outside what the model was trained on and leaves the row unscored.
+VALUE_RANGES = {
+    'age': (65, 95, False),
+    'bmi': (15, 45, False),
+    'gait_speed': (0, 10, False),
+    'balance_score': (0, 10, False),
+    'muscle_strength': (0, 10, False),
+    'previous_falls': (0, 10, True),
+    'num_medications': (0, 15, True),
+    'takes_sedatives': (0, 1, True),
+    'takes_blood_pressure_meds': (0, 1, True),
+    'has_arthritis': (0, 1, True),
+    'has_osteoporosis': (0, 1, True),
+    'has_parkinsons': (0, 1, True),
+    'has_diabetes': (0, 1, True),
+    'vision_impairment': (0, 1, True),
+    'cognitive_score': (0, 10, False),
+    'uses_walking_aid': (0, 1, True),
+    'lives_alone': (0, 1, True),
+    'home_hazards': (0, 10, True),
+    'activity_level': (0, 10, False)
+}
+
+# Scored files of the Batch Scoring tab; ones older than OUTPUT_TTL_SECONDS are
+# deleted on the next rerun of any session, so abandoned sessions leave nothing behind
+OUTPUT_DIR = os.path.join(tempfile.gettempdir(), 'fall_risk_batch')
+OUTPUT_TTL_SECONDS = 3600
+
+def required_columns(encoder):
+    """Dataset columns the encoder needs, in feature order"""
+    return list(dict.fromkeys(FEATURE_SOURCES[name] for name in encoder.feature_names))
+
+def is_parquet(name):
+    return str(name).lower().endswith('.parquet')
+
+def count_rows(source, name):
+    """Row count of a Parquet file from its footer; None for CSV (unknown without a full pass)"""
+    if not is_parquet(name):
+        return None
+    import pyarrow.parquet as pq
+    rows = pq.ParquetFile(source).metadata.num_rows
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return rows
+
+def iter_chunks(source, name, columns, chunksize=DEFAULT_CHUNK_ROWS, skip_rows=0):
+    """
+    Yield the needed columns of an uploaded CSV/Parquet file as DataFrame chunks
+
+    source is a path or a binary file object; name decides the format.
+    Only the model's columns (plus PASSTHROUGH_COLUMNS) are read, and
+    numeric columns are left for validate_chunk to coerce so one malformed
+    value invalidates its row rather than the whole chunk. The first
+    skip_rows data rows are skipped without being parsed into chunks.
+    """
+    if is_parquet(name):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        available = parquet_file.schema_arrow.names
+        wanted = [col for col in columns + PASSTHROUGH_COLUMNS if col in available]
+        check_columns(available, columns)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=wanted):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+        return
+
+    header = pd.read_csv(source, nrows=0).columns.tolist()
+    check_columns(header, columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    wanted = set(columns + PASSTHROUGH_COLUMNS)
+    yield from pd.read_csv(source, usecols=lambda col: col in wanted,
+                           dtype={col: 'object' for col in PASSTHROUGH_COLUMNS + ['gender']},
+                           skiprows=range(1, skip_rows + 1) if skip_rows else None,
+                           chunksize=chunksize)
+
+def check_columns(available, columns):
+    missing = [col for col in columns if col not in available]
+    if missing:
+        raise ValueError(f"Missing columns for the model: {missing}")
+
+def validate_chunk(df, columns):
+    """
+    Numeric copy of the model columns and a mask of rows that can be scored
+
+    Non-numeric or missing values, values outside VALUE_RANGES and unknown
+    genders mark a row invalid; the rest of the chunk is still scored.
+    """
+    clean = {}
+    valid = np.ones(len(df), dtype=bool)
+    for col in columns:
+        if col == 'gender':
+            values = df[col].to_numpy(dtype=object)
+            valid &= pd.Series(values).isin(GENDERS).to_numpy()
+            clean[col] = values
+        else:
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+            valid &= in_range(col, values)
+            clean[col] = values
+    return clean, valid
+
+def in_range(col, values):
+    """Mask of finite values inside the column's VALUE_RANGES entry (if it has one)"""
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(values)
+    if col in VALUE_RANGES:
+        low, high, whole = VALUE_RANGES[col]
+        with np.errstate(invalid='ignore'):
+            ok &= (values >= low) & (values <= high)
+            if whole:
+                ok &= values == np.round(values)
+    return ok
+
+def score_chunk(df, scorer, encoder, bands):
+    """
+    Scored rows of one chunk: passthrough ids, calibrated probability, risk band and urgency
+
+    All valid rows are encoded into one matrix and scored with a single
+    vectorized call; invalid rows keep an empty probability and band.
+    """
+    columns = required_columns(encoder)
+    clean, valid = validate_chunk(df, columns)
+    # Same encoding (and dtype) as the app's single-patient path, so scores match it exactly
+    X = encoder.encode(clean)[valid]
+
+    probability = np.full(len(df), np.nan)
+    risk_band = np.full(len(df), '', dtype=object)
+    urgency = np.full(len(df), '', dtype=object)
+    if len(X):
+        p = bands.calibrate(np.asarray(scorer.predict_risk(X), dtype=np.float64))
+        probability[valid] = p
+        risk_band[valid] = np.asarray(BAND_LABELS['risk'], dtype=object)[bands.band('risk', p)]
+        urgency[valid] = np.asarray(BAND_LABELS['urgency'], dtype=object)[bands.band('urgency', p)]
+
+    scored = df[[col for col in PASSTHROUGH_COLUMNS if col in df.columns]].reset_index(drop=True)
+    scored['probability'] = probability
+    scored['risk_band'] = risk_band
+    scored['urgency'] = urgency
+    return scored, valid
+
+def scored_csv(scored, header=False):
+    """CSV text of a scored chunk"""
+    # Six decimals is far finer than a risk is ever read at, and rounding
+    # first is much cheaper than a per-value float_format in to_csv
+    return scored.round({'probability': 6}).to_csv(header=header, index=False)
+
+def band_counts(scored, valid, bands):
+    """Scored rows per risk band (from the unrounded probabilities)"""
+    return np.bincount(bands.band('risk', scored['probability'].to_numpy()[valid]),
+                       minlength=len(BAND_LABELS['risk']))
+
+def prune_outputs(output_dir=OUTPUT_DIR, ttl=OUTPUT_TTL_SECONDS):
+    """Delete scored files last written more than ttl seconds ago"""
+    if not os.path.isdir(output_dir):
+        return
+    cutoff = time.time() - ttl
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            # Another session pruned it first
+            pass
+
+def new_output_path(output_dir=OUTPUT_DIR):
+    """Fresh, empty file for one scored upload"""
+    os.makedirs(output_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix='.csv.gz', dir=output_dir)
+    os.close(fd)
+    return path
+
+def score_file(source, name, output_path, scorer, encoder, bands,
+               chunksize=DEFAULT_CHUNK_ROWS, progress=None):
+    """
+    Score a whole file chunk by chunk into a gzipped CSV
+
+    Each scored chunk is appended to output_path and dropped, so memory is
+    bounded by the chunk size whatever the file size. progress(rows_done,
+    fraction) is called after every chunk; fraction comes from the Parquet
+    row count or, for CSV, the position in the file (None if unknown).
+    Returns row, invalid-row and per-band counts.
+    """
+    total_rows = count_rows(source, name)
+    total_bytes = getattr(source, 'size', None)
+
+    n_rows = 0
+    n_invalid = 0
+    risk_counts = np.zeros(len(BAND_LABELS['risk']), dtype=np.int64)
+    # Fastest gzip level: at the default level compression costs more than scoring
+    with gzip.open(output_path, 'wt', newline='', compresslevel=1) as out:
+        for i, chunk in enumerate(iter_chunks(source, name, required_columns(encoder), chunksize)):
+            scored, valid = score_chunk(chunk, scorer, encoder, bands)
+            out.write(scored_csv(scored, header=(i == 0)))
+
+            n_rows += len(scored)
+            n_invalid += int((~valid).sum())
+            risk_counts += band_counts(scored, valid, bands)
+
+            if progress is not None:
+                if total_rows:
+                    fraction = n_rows / total_rows
+                elif total_bytes and hasattr(source, 'tell'):
+                    fraction = source.tell() / total_bytes
+                else:
+                    fraction = None
+                progress(n_rows, fraction)
+
+    return {
+        'n_rows': n_rows,
+        'n_invalid': n_invalid,
+        'risk_bands': dict(zip(BAND_LABELS['risk'], risk_counts.tolist())),
+        'output_bytes': os.path.getsize(output_path)
+    }
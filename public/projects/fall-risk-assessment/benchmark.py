@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.preprocessing import StandardScaler
+
+from fast_scorer import numpy_scorer
+from generate_data_improved import generate_fall_risk_data
+from train_model_fixed import build_models, prepare_features
+from training_cache import library_versions
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+STAGES = ['generate', 'features', 'fit', 'predict']
+
+# Largest training set each candidate is fitted on (the exact GB is quadratic-ish)
+FIT_ROW_LIMITS = {
+    'Random Forest': 1_000_000,
+    'Gradient Boosting': 100_000,
+    'Histogram Gradient Boosting': 10_000_000,
+    'Logistic Regression': 10_000_000
+}
+
+# The pure-Python row-by-row generator is only timed on small cohorts
+ROWWISE_MAX_ROWS = 100_000
+
+# Single-row scoring is repeated to get a stable per-call time
+SINGLE_ROW_REPEATS = 200
+
+def measure(stage, name, cohort, n_rows, func, repeats=1, trace_memory=True):
+    """
+    Run func, returning (result, record) with wall time, throughput and peak memory
+
+    cohort is the benchmark size being run; n_rows is how many rows func
+    actually processes (one for single-row scoring, capped for slow fits).
+    tracemalloc slows allocation-heavy code by an order of magnitude, so
+    peak memory (Python objects and NumPy buffers) comes from a second,
+    traced run rather than the timed one.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    seconds = (time.perf_counter() - start) / repeats
+
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 1024 ** 2
+
+    record = {
+        'stage': stage,
+        'name': name,
+        'cohort': cohort,
+        'n_rows': n_rows,
+        'seconds': seconds,
+        'rows_per_sec': n_rows / seconds if seconds > 0 else None,
+        'peak_mb': peak_mb
+    }
+    memory = f"{peak_mb:9.1f} MB" if peak_mb is not None else ""
+    print(f"   {stage:9s} {name:44s} {n_rows:>11,} rows  {seconds:9.4f}s  {memory}")
+    return result, record
+
+def benchmark_size(n_rows, stages, trace_memory=True):
+    """All requested stages for one cohort size"""
+    records = []
+
+    def measure_stage(*args, **kwargs):
+        return measure(*args, trace_memory=trace_memory, **kwargs)
+
+    if 'generate' in stages and n_rows <= ROWWISE_MAX_ROWS:
+        _, record = measure_stage('generate', 'rowwise', n_rows, n_rows, lambda: generate_fall_risk_data(n_rows))
+        records.append(record)
+
+    np.random.seed(42)
+    df, record = measure_stage('generate', 'columnar', n_rows, n_rows,
+                         lambda: generate_fall_risk_data(n_rows, columnar=True))
+    if 'generate' in stages:
+        records.append(record)
+
+    def features():
+        X, feature_names = prepare_features(df)
+        scaler = StandardScaler()
+        return X, feature_names, scaler, scaler.fit_transform(X)
+
+    (X, feature_names, scaler, X_scaled), record = measure_stage('features', 'prepare_features+scale', n_rows, n_rows, features)
+    if 'features' in stages:
+        records.append(record)
+    y = df['actual_fall_6months'].to_numpy()
+    del df
+
+    if 'fit' not in stages and 'predict' not in stages:
+        return records
+
+    for name, base_model in build_models(rf_n_jobs=-1).items():
+        n_fit = min(n_rows, FIT_ROW_LIMITS[name])
+        model = clone(base_model)
+        _, record = measure_stage('fit', name, n_rows, n_fit, lambda: model.fit(X_scaled[:n_fit], y[:n_fit]))
+        if 'fit' in stages:
+            records.append(record)
+
+        if 'predict' not in stages:
+            continue
+
+        row = X_scaled[:1]
+        _, record = measure_stage('predict', f"{name} single (sklearn)", n_rows, 1,
+                            lambda: model.predict_proba(row), repeats=SINGLE_ROW_REPEATS)
+        records.append(record)
+        _, record = measure_stage('predict', f"{name} batch (sklearn)", n_rows, n_rows,
+                            lambda: model.predict_proba(X_scaled))
+        records.append(record)
+
+        # The NumPy scorer the app uses, where this model type has one
+        scorer = numpy_scorer(model, scaler, feature_names)
+        if scorer is not None:
+            _, record = measure_stage('predict', f"{name} single (numpy)", n_rows, 1,
+                                lambda: scorer.predict_risk(X[0]), repeats=SINGLE_ROW_REPEATS)
+            records.append(record)
+            _, record = measure_stage('predict', f"{name} batch (numpy)", n_rows, n_rows,
+                                lambda: scorer.predict_risk(X))
+            records.append(record)
+
+    return records
+
+def result_key(record):
+    return (record['stage'], record['name'], record['cohort'])
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.01, min_mb=1.0):
+    """
+    Measurements that got worse than the baseline
+
+    A regression has to exceed both the relative tolerance and an absolute
+    floor (min_seconds / min_mb), so timer and allocator noise on tiny
+    measurements is not flagged.
+    """
+    previous = {result_key(record): record for record in baseline['results']}
+    regressions = []
+    for record in results['results']:
+        old = previous.get(result_key(record))
+        if old is None:
+            continue
+        if (record['seconds'] > old['seconds'] * (1 + tolerance)
+                and record['seconds'] - old['seconds'] > min_seconds):
+            regressions.append({**record, 'metric': 'seconds', 'baseline': old['seconds'],
+                                'ratio': record['seconds'] / old['seconds']})
+        if (record['peak_mb'] is not None and old['peak_mb'] is not None
+                and record['peak_mb'] > old['peak_mb'] * (1 + tolerance)
+                and record['peak_mb'] - old['peak_mb'] > min_mb):
+            regressions.append({**record, 'metric': 'peak_mb', 'baseline': old['peak_mb'],
+                                'ratio': record['peak_mb'] / old['peak_mb']})
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generation, training and scoring at several cohort sizes")
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help="Comma-separated cohort sizes")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated subset of {STAGES}")
+    parser.add_argument('--output', default='benchmarks/results.json')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Skip the traced peak-memory runs (halves the run time)")
+    parser.add_argument('--compare', default=None,
+                        help="Baseline results file; exits non-zero if anything regressed")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative slowdown / memory growth flagged as a regression")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stages = args.stages.split(',')
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {sorted(unknown)}")
+
+    print("⏱️  Fall Risk Assessment - Scaling Benchmark")
+    print("=" * 60)
+
+    records = []
+    for n_rows in sizes:
+        print(f"\n📏 {n_rows:,} patients")
+        records.extend(benchmark_size(n_rows, stages, trace_memory=not args.no_memory))
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {**library_versions(), 'cpu_count': os.cpu_count()},
+        'results': records
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.compare}:")
+            for r in regressions:
+                print(f"   {r['stage']} {r['name']} @ {r['cohort']:,}: {r['metric']} "
+                      f"{r['baseline']:.4g} → {r[r['metric']]:.4g} ({r['ratio']:.2f}x)")
+            raise SystemExit(1)
+        print(f"\n✅ No regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,95 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+# Yes/no columns, stored as int8 (0/1) rather than int64
+BINARY_FLAGS = [
+    'takes_sedatives', 'takes_blood_pressure_meds', 'has_arthritis',
+    'has_osteoporosis', 'has_parkinsons', 'has_diabetes', 'vision_impairment',
+    'uses_walking_aid', 'lives_alone', 'actual_fall_6months'
+]
+
+SCORE_COLUMNS = [
+    'bmi', 'gait_speed', 'balance_score', 'muscle_strength',
+    'cognitive_score', 'activity_level', 'risk_score', 'sampling_weight'
+]
+
+DATASET_DTYPES = {
+    'patient_id': 'object',
+    'age': 'int16',
+    'gender': pd.CategoricalDtype(['Female', 'Male']),
+    'previous_falls': 'int8',
+    'num_medications': 'int8',
+    'home_hazards': 'int8',
+    'risk_category': pd.CategoricalDtype(['Low', 'Medium', 'High'], ordered=True),
+    **{col: 'int8' for col in BINARY_FLAGS},
+    **{col: 'float32' for col in SCORE_COLUMNS}
+}
+
+def parquet_available():
+    """True when a Parquet engine (pyarrow) is installed"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def typed_path(csv_path):
+    """Path of the typed Parquet copy that sits next to a dataset CSV"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def has_fresh_typed_copy(csv_path):
+    """True when a readable Parquet copy exists and is at least as new as the CSV"""
+    parquet_path = typed_path(csv_path)
+    if not (parquet_available() and os.path.exists(parquet_path)):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+def to_typed(df):
+    """Cast a generated dataset to its compact typed schema"""
+    return df.astype({col: dtype for col, dtype in DATASET_DTYPES.items() if col in df.columns})
+
+def write_dataset(df, csv_path):
+    """Write a dataset as CSV plus a typed Parquet copy (when pyarrow is installed)"""
+    df.to_csv(csv_path, index=False)
+    if parquet_available():
+        to_typed(df).to_parquet(typed_path(csv_path), index=False)
+
+def load_dataset(csv_path, columns=None):
+    """
+    Load a dataset with typed columns
+
+    Prefers the Parquet copy when it is at least as new as the CSV, and falls
+    back to parsing the CSV with the same dtypes.
+    """
+    if has_fresh_typed_copy(csv_path):
+        return pd.read_parquet(typed_path(csv_path), columns=columns)
+
+    return pd.read_csv(csv_path, usecols=columns, dtype=DATASET_DTYPES)
+
+def iter_dataset_chunks(csv_path, chunksize=100_000, columns=None):
+    """Yield a dataset as typed DataFrame chunks without loading it all"""
+    if has_fresh_typed_copy(csv_path):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(typed_path(csv_path))
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(csv_path, usecols=columns, dtype=DATASET_DTYPES, chunksize=chunksize)
+
+class TypedDatasetWriter:
+    """Incremental Parquet writer used alongside a streamed CSV"""
+
+    def __init__(self, csv_path):
+        self.path = typed_path(csv_path)
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(to_typed(df), preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
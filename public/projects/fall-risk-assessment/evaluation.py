@@ -0,0 +1,141 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Probability bins per class; finer than any realistic test set can resolve
+N_BINS = 2 ** 16
+
+# Bootstrap replicates drawn per task (fixed, so results don't depend on worker count)
+BOOTSTRAP_BATCH = 50
+
+METRICS = ['accuracy', 'auc', 'sensitivity', 'specificity']
+
+def metrics_from_counts(neg, pos, predicted_positive):
+    """
+    Accuracy, AUC, sensitivity and specificity from per-bin class counts
+
+    neg/pos are (..., n_cells) counts of negatives/positives in each
+    probability cell (in increasing probability order); predicted_positive
+    marks the cells above the decision threshold. Leading axes are kept, so
+    a whole batch of bootstrap replicates is scored at once. Rows that share
+    a cell count as tied scores for AUC, as in roc_auc_score.
+    """
+    neg = np.asarray(neg, dtype=np.float64)
+    pos = np.asarray(pos, dtype=np.float64)
+    n_neg = neg.sum(axis=-1)
+    n_pos = pos.sum(axis=-1)
+
+    tp = (pos * predicted_positive).sum(axis=-1)
+    fp = (neg * predicted_positive).sum(axis=-1)
+    fn = n_pos - tp
+    tn = n_neg - fp
+
+    # Mann-Whitney: each positive beats the negatives in lower cells, ties count half
+    neg_below = np.cumsum(neg, axis=-1) - neg
+    wins = (pos * (neg_below + 0.5 * neg)).sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'accuracy': (tp + tn) / (n_pos + n_neg),
+            'auc': wins / (n_pos * n_neg),
+            'sensitivity': np.where(n_pos > 0, tp / n_pos, 0.0),
+            'specificity': np.where(n_neg > 0, tn / n_neg, 0.0),
+            'tp': tp, 'tn': tn, 'fp': fp, 'fn': fn
+        }
+
+def bootstrap_task(neg, pos, predicted_positive, n_replicates, seed):
+    """Metrics for n_replicates multinomial resamples of the (label, cell) counts"""
+    rng = np.random.default_rng(seed)
+    counts = np.concatenate([neg, pos])
+    n_total = int(counts.sum())
+
+    # Resampling rows with replacement == drawing cell counts from a multinomial
+    samples = rng.multinomial(n_total, counts / n_total, size=n_replicates)
+    n_cells = len(neg)
+    metrics = metrics_from_counts(samples[:, :n_cells], samples[:, n_cells:], predicted_positive)
+    return np.column_stack([metrics[name] for name in METRICS])
+
+class StreamingEvaluator:
+    """
+    Binary classification metrics accumulated in one pass over chunks
+
+    Each update() bins the predicted probabilities and adds them to a
+    (label x bin) histogram, so memory is fixed no matter how many rows are
+    streamed through. Bin b holds probabilities in (b/N, (b+1)/N], so the
+    default 0.5 threshold matches predict() (positive when p > 0.5) exactly.
+    """
+
+    def __init__(self, n_bins=N_BINS):
+        self.n_bins = n_bins
+        self.counts = np.zeros((2, n_bins), dtype=np.int64)
+
+    def bin_index(self, y_prob):
+        bins = np.ceil(np.asarray(y_prob, dtype=np.float64) * self.n_bins).astype(np.int64) - 1
+        return np.clip(bins, 0, self.n_bins - 1)
+
+    def update(self, y_true, y_prob):
+        """Add one chunk of labels and predicted probabilities"""
+        y_true = np.asarray(y_true).astype(np.int64)
+        cells = y_true * self.n_bins + self.bin_index(y_prob)
+        self.counts += np.bincount(cells, minlength=2 * self.n_bins).reshape(2, self.n_bins)
+        return self
+
+    def merge(self, other):
+        """Combine with an evaluator filled from another chunk stream"""
+        if other.n_bins != self.n_bins:
+            raise ValueError("Cannot merge evaluators with different bin counts")
+        self.counts += other.counts
+        return self
+
+    @property
+    def n_samples(self):
+        return int(self.counts.sum())
+
+    def occupied_cells(self, threshold):
+        """(neg, pos, predicted_positive) over the bins that hold any rows"""
+        occupied = np.flatnonzero(self.counts.sum(axis=0))
+        threshold_bin = int(round(threshold * self.n_bins))
+        return self.counts[0, occupied], self.counts[1, occupied], occupied >= threshold_bin
+
+    def weighted_scores(self):
+        """(labels, bin-centre scores, counts) of the occupied cells, for weighted fitting"""
+        labels, bins = np.nonzero(self.counts)
+        return labels, (bins + 0.5) / self.n_bins, self.counts[labels, bins]
+
+    def metrics(self, threshold=0.5):
+        """Point estimates (and confusion counts) at the given decision threshold"""
+        metrics = metrics_from_counts(*self.occupied_cells(threshold))
+        result = {name: float(metrics[name]) for name in METRICS}
+        result.update({name: int(metrics[name]) for name in ('tp', 'tn', 'fp', 'fn')})
+        result['n_samples'] = self.n_samples
+        return result
+
+    def bootstrap(self, n_bootstrap=1000, level=0.95, threshold=0.5, seed=42, workers=None):
+        """
+        Percentile bootstrap confidence intervals for every metric
+
+        Replicates are drawn in fixed-size batches, each with its own child
+        seed, spread over a process pool. Resampling works on the histogram,
+        so the cost does not grow with the number of test rows.
+        """
+        neg, pos, predicted_positive = self.occupied_cells(threshold)
+        n_tasks = math.ceil(n_bootstrap / BOOTSTRAP_BATCH)
+        seeds = np.random.SeedSequence(seed).spawn(n_tasks)
+        sizes = [min(BOOTSTRAP_BATCH, n_bootstrap - i * BOOTSTRAP_BATCH) for i in range(n_tasks)]
+
+        workers = min(workers or os.cpu_count() or 1, n_tasks)
+        if workers == 1:
+            batches = [bootstrap_task(neg, pos, predicted_positive, size, s) for size, s in zip(sizes, seeds)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                batches = list(pool.map(bootstrap_task, [neg] * n_tasks, [pos] * n_tasks,
+                                        [predicted_positive] * n_tasks, sizes, seeds))
+        replicates = np.concatenate(batches)
+
+        alpha = (1 - level) / 2
+        low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+        intervals = {name: [float(low[i]), float(high[i])] for i, name in enumerate(METRICS)}
+        intervals.update({'level': level, 'n_bootstrap': n_bootstrap, 'threshold': threshold})
+        return intervals
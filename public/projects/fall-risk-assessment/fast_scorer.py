@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from model_bundle import ModelBundle, write_bundle
+from tree_engine import TreeEnsembleScorer
+
+BUNDLE_FILE = 'model.bundle'
+
+def sigmoid(z):
+    """Numerically stable logistic function"""
+    return np.exp(-np.logaddexp(0, -z))
+
+class LinearScorer:
+    """
+    Scaler + linear model folded into one weight vector
+
+    P(fall) = sigmoid(x @ weights + bias) on raw (unscaled) features, for one
+    row or a batch. Needs only NumPy.
+    """
+
+    scorer_file = 'linear_scorer.npz'
+    bundle_type = 'linear'
+
+    def __init__(self, weights, bias, feature_names, coef=None):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.feature_names = list(feature_names)
+        # Coefficients on the standardised features (for importance plots)
+        self.coef = None if coef is None else np.asarray(coef, dtype=np.float64)
+
+        if len(self.weights) != len(self.feature_names):
+            raise ValueError(
+                f"Scorer has {len(self.weights)} weights for {len(self.feature_names)} features"
+            )
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_names):
+        """Fold StandardScaler statistics into a fitted binary linear model"""
+        coef = np.asarray(model.coef_[0], dtype=np.float64)
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        weights = coef / scale
+        bias = float(model.intercept_[0]) - float(np.dot(coef, mean / scale))
+        return cls(weights, bias, feature_names, coef)
+
+    def save(self, path):
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=np.array([self.bias]),
+            coef=self.coef if self.coef is not None else np.array([]),
+            feature_names=np.array(self.feature_names)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            coef = data['coef'] if data['coef'].size else None
+            return cls(data['weights'], data['bias'][0], data['feature_names'].tolist(), coef)
+
+    def bundle_state(self):
+        """(params, arrays) stored in a model bundle"""
+        arrays = {'weights': self.weights}
+        if self.coef is not None:
+            arrays['coef'] = self.coef
+        return {'bias': self.bias}, arrays
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        coef = bundle.array('coef') if bundle.has_array('coef') else None
+        return cls(bundle.array('weights'), bundle.params['bias'], bundle.feature_names, coef)
+
+    def predict_risk(self, X):
+        """Fall probability for a feature vector (scalar) or matrix (1-D array)"""
+        return sigmoid(np.asarray(X) @ self.weights + self.bias)
+
+class SklearnScorer:
+    """Fallback scorer around the pickled sklearn model and scaler"""
+
+    def __init__(self, model, scaler, feature_names):
+        self.model = model
+        self.feature_names = list(feature_names)
+        # Schema and scaler are checked once here
+        self.encoder = FeatureEncoder(feature_names, scaler)
+        self.coef = np.asarray(model.coef_[0]) if hasattr(model, 'coef_') else None
+
+    @classmethod
+    def load(cls, models_dir='models'):
+        import joblib
+        model = joblib.load(os.path.join(models_dir, 'fall_risk_model.pkl'))
+        scaler = joblib.load(os.path.join(models_dir, 'scaler.pkl'))
+        with open(os.path.join(models_dir, 'feature_names.json')) as f:
+            feature_names = json.load(f)
+        return cls(model, scaler, feature_names)
+
+    def predict_risk(self, X):
+        """Fall probability for a feature vector (scalar) or matrix (1-D array)"""
+        X = np.asarray(X, dtype=np.float64)
+        single = X.ndim == 1
+        X_scaled = (X.reshape(-1, len(self.feature_names)) - self.encoder.mean) / self.encoder.scale
+        proba = self.model.predict_proba(X_scaled)[:, 1]
+        return proba[0] if single else proba
+
+# Exported weight files / bundle scorer types and the class that reads each one
+SCORER_FILES = {cls.scorer_file: cls for cls in (LinearScorer, TreeEnsembleScorer)}
+SCORER_TYPES = {cls.bundle_type: cls for cls in (LinearScorer, TreeEnsembleScorer)}
+
+def load_scorer(models_dir='models'):
+    """
+    Fastest available scorer for the model in models_dir
+
+    Uses the exported weight file named in metadata.json when there is one,
+    otherwise the pickled sklearn model and scaler.
+    """
+    with open(os.path.join(models_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    with open(os.path.join(models_dir, 'feature_names.json')) as f:
+        feature_names = json.load(f)
+
+    scorer_file = metadata.get('scorer_file')
+    if scorer_file and os.path.exists(os.path.join(models_dir, scorer_file)):
+        scorer = SCORER_FILES[scorer_file].load(os.path.join(models_dir, scorer_file))
+        if scorer.feature_names != feature_names:
+            raise ValueError(f"{scorer_file} was exported for a different feature schema")
+        return scorer
+
+    return SklearnScorer.load(models_dir)
+
+def load_serving_model(models_dir='models'):
+    """
+    (scorer, metadata) for the app
+
+    Reads the single memory-mapped bundle when there is one, otherwise the
+    separate weight/pickle files and metadata.json.
+    """
+    bundle_path = os.path.join(models_dir, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        bundle = ModelBundle.open(bundle_path)
+        if bundle.scorer_type not in SCORER_TYPES:
+            raise ValueError(f"{bundle_path} holds an unknown scorer type '{bundle.scorer_type}'")
+        return SCORER_TYPES[bundle.scorer_type].from_bundle(bundle), bundle.metadata
+
+    with open(os.path.join(models_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    return load_scorer(models_dir), metadata
+
+def model_version(scorer, metadata):
+    """
+    Fingerprint of what a model serves, for keying anything derived from it
+
+    Covers the scorer's parameters and arrays (scaler included) plus the
+    calibration and band cut-offs, and nothing else from the metadata:
+    timings and metrics change on every run, so retraining to an identical
+    model keeps its version (and its surface, cache entries and checkpoints).
+    """
+    if hasattr(scorer, 'bundle_state'):
+        params, arrays = scorer.bundle_state()
+        arrays = dict(arrays)
+        if hasattr(scorer, 'mean'):
+            arrays.update(scaler_mean=scorer.mean, scaler_scale=scorer.scale)
+        kind = scorer.bundle_type
+    else:
+        import pickle
+        params = None
+        arrays = {'model': np.frombuffer(pickle.dumps(scorer.model, protocol=4), dtype=np.uint8),
+                  'scaler_mean': scorer.encoder.mean, 'scaler_scale': scorer.encoder.scale}
+        kind = type(scorer.model).__name__
+
+    bands = metadata.get('risk_bands') or {}
+    digest = hashlib.sha256(json.dumps({
+        'scorer': kind,
+        'params': params,
+        'feature_names': scorer.feature_names,
+        'calibration': metadata.get('calibration'),
+        'cutoffs': {family: band['cutoffs'] for family, band in bands.items()}
+    }, sort_keys=True, default=str).encode())
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def numpy_scorer(model, scaler, feature_names):
+    """NumPy-only scorer for a fitted model, or None when its type has no export"""
+    if hasattr(model, 'coef_'):
+        return LinearScorer.from_sklearn(model, scaler, feature_names)
+    if type(model).__name__ in ('RandomForestClassifier', 'GradientBoostingClassifier'):
+        return TreeEnsembleScorer.from_sklearn(model, scaler, feature_names)
+    return None
+
+def export_scorer(model, scaler, feature_names, models_dir='models'):
+    """Write the NumPy-only weight file for the model; returns its file name or None"""
+    scorer = numpy_scorer(model, scaler, feature_names)
+    if scorer is None:
+        return None
+    scorer.save(os.path.join(models_dir, scorer.scorer_file))
+    return scorer.scorer_file
+
+def export_bundle(model, scaler, feature_names, metadata, models_dir='models'):
+    """Write model.bundle (scorer arrays, scaler, schema, metadata); returns its file name or None"""
+    bundle_path = os.path.join(models_dir, BUNDLE_FILE)
+    scorer = numpy_scorer(model, scaler, feature_names)
+    if scorer is None:
+        # A stale bundle would shadow the new pickles in load_serving_model()
+        if os.path.exists(bundle_path):
+            os.remove(bundle_path)
+        return None
+    params, arrays = scorer.bundle_state()
+    write_bundle(bundle_path, scorer.bundle_type, feature_names,
+                 scaler.mean_, scaler.scale_, params, arrays, metadata)
+    return BUNDLE_FILE
+
+if __name__ == "__main__":
+    # Export the fused scorer and bundle from the current pickled artifacts
+    import joblib
+    model = joblib.load('models/fall_risk_model.pkl')
+    scaler = joblib.load('models/scaler.pkl')
+    with open('models/feature_names.json') as f:
+        feature_names = json.load(f)
+    
+    scorer_file = export_scorer(model, scaler, feature_names)
+    
+    with open('models/metadata.json') as f:
+        metadata = json.load(f)
+    if scorer_file is None:
+        metadata.pop('scorer_file', None)
+        print("ℹ️  No NumPy scorer for this model type; the app keeps using the pickled model")
+    else:
+        metadata['scorer_file'] = scorer_file
+        print(f"✅ Fused scorer written to models/{scorer_file}")
+    
+    metadata.pop('bundle_file', None)
+    bundle_file = export_bundle(model, scaler, feature_names, metadata)
+    if bundle_file is not None:
+        metadata['bundle_file'] = bundle_file
+        print(f"✅ Model bundle written to models/{bundle_file}")
+    with open('models/metadata.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+
+# Every model feature and the dataset column it is built from
+FEATURE_SOURCES = {
+    'age': 'age',
+    'bmi': 'bmi',
+    'gait_speed': 'gait_speed',
+    'balance_score': 'balance_score',
+    'muscle_strength': 'muscle_strength',
+    'previous_falls': 'previous_falls',
+    'num_medications': 'num_medications',
+    'takes_sedatives': 'takes_sedatives',
+    'takes_blood_pressure_meds': 'takes_blood_pressure_meds',
+    'has_arthritis': 'has_arthritis',
+    'has_osteoporosis': 'has_osteoporosis',
+    'has_parkinsons': 'has_parkinsons',
+    'has_diabetes': 'has_diabetes',
+    'vision_impairment': 'vision_impairment',
+    'cognitive_score': 'cognitive_score',
+    'uses_walking_aid': 'uses_walking_aid',
+    'lives_alone': 'lives_alone',
+    'home_hazards': 'home_hazards',
+    'activity_level': 'activity_level',
+    'gender_male': 'gender'
+}
+
+# Training column order (what models/feature_names.json is written from)
+DEFAULT_FEATURES = list(FEATURE_SOURCES)
+
+class FeatureEncoder:
+    """
+    Turns patient records into the model's feature matrix
+
+    Accepts a single record (dict of scalars), a list of records, a dict of
+    arrays or a DataFrame, and returns a C-contiguous matrix in the trained
+    column order. The schema (and the scaler, if given) is checked once, here.
+    """
+
+    def __init__(self, feature_names=None, scaler=None):
+        self.feature_names = list(feature_names or DEFAULT_FEATURES)
+
+        unknown = [name for name in self.feature_names if name not in FEATURE_SOURCES]
+        if unknown:
+            raise ValueError(f"Unknown features in schema: {unknown}")
+
+        self.mean = None
+        self.scale = None
+        if scaler is not None:
+            if scaler.n_features_in_ != len(self.feature_names):
+                raise ValueError(
+                    f"Scaler expects {scaler.n_features_in_} features, schema has {len(self.feature_names)}"
+                )
+            fitted_names = getattr(scaler, 'feature_names_in_', None)
+            if fitted_names is not None and list(fitted_names) != self.feature_names:
+                raise ValueError("Scaler was fitted with a different feature order than the schema")
+            self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+            self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    @classmethod
+    def load(cls, path='models/feature_names.json', scaler=None):
+        with open(path) as f:
+            return cls(json.load(f), scaler)
+
+    def column(self, data, name):
+        """Raw values of one feature from a record, dict of arrays or DataFrame"""
+        if name in data:
+            return data[name]
+        source = FEATURE_SOURCES[name]
+        if name == 'gender_male' and source in data:
+            return np.asarray(data[source]) == 'Male'
+        raise KeyError(f"Missing column for feature '{name}'")
+
+    def encode(self, data, dtype=np.float32):
+        """Feature matrix (n_rows, n_features) in the trained column order"""
+
+        if isinstance(data, (list, tuple)):
+            return np.array(
+                [[self.column(record, name) for name in self.feature_names] for record in data],
+                dtype=dtype
+            ).reshape(len(data), len(self.feature_names))
+
+        first = self.column(data, self.feature_names[0])
+        if np.ndim(first) == 0:
+            # Single record
+            return np.array(
+                [[self.column(data, name) for name in self.feature_names]], dtype=dtype
+            )
+
+        X = np.empty((len(first), len(self.feature_names)), dtype=dtype)
+        for j, name in enumerate(self.feature_names):
+            X[:, j] = self.column(data, name)
+        return X
+
+    def transform(self, data, dtype=np.float32):
+        """Encoded and standardised matrix, ready for the model"""
+        X = self.encode(data, dtype=np.float64)
+        if self.mean is not None:
+            X -= self.mean
+            X /= self.scale
+        return np.ascontiguousarray(X, dtype=dtype)
@@ -0,0 +1,226 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import generate_data
+import generate_data_improved
+from dataset_io import TypedDatasetWriter, parquet_available, write_dataset
+
+GENERATORS = {
+    'improved': generate_data_improved.generate_fall_risk_data_columnar,
+    'basic': generate_data.generate_fall_risk_data_columnar
+}
+
+def patient_id_width(n_patients):
+    """Zero-padding width that keeps every PT id in a cohort the same length"""
+    return max(4, len(str(n_patients)))
+
+def plan_shards(n_patients, shard_size, seed=42):
+    """
+    Split a cohort into fixed-size shards with independent seed streams
+
+    Shard boundaries and seeds depend only on (n_patients, shard_size, seed),
+    never on the number of workers, so the output is reproducible.
+    """
+    n_shards = max(1, -(-n_patients // shard_size))
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(n_shards)
+
+    shards = []
+    for index, shard_seed in enumerate(seeds):
+        start = index * shard_size
+        shards.append({
+            'index': index,
+            'start_id': start + 1,
+            'n_patients': min(shard_size, n_patients - start),
+            'seed': shard_seed
+        })
+    return shards
+
+def generate_shard(shard, generator='improved', id_width=4):
+    """Generate one shard as a DataFrame"""
+    rng = np.random.default_rng(shard['seed'])
+    return GENERATORS[generator](
+        shard['n_patients'],
+        start_id=shard['start_id'],
+        rng=rng,
+        id_width=id_width
+    )
+
+def write_shard(shard, out_dir, prefix, generator='improved', id_width=4):
+    """Generate one shard and write it to its own CSV (plus typed Parquet) file"""
+    df = generate_shard(shard, generator, id_width)
+    path = os.path.join(out_dir, f"{prefix}_shard{shard['index']:05d}.csv")
+    write_dataset(df, path)
+    return path, len(df)
+
+def generate_sharded(n_patients, out_dir='data', prefix='fall_risk', shard_size=100_000,
+                     workers=None, seed=42, generator='improved'):
+    """Generate a cohort shard by shard on a process pool, one file per shard"""
+
+    os.makedirs(out_dir, exist_ok=True)
+    shards = plan_shards(n_patients, shard_size, seed)
+    id_width = patient_id_width(n_patients)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(write_shard, shard, out_dir, prefix, generator, id_width)
+            for shard in shards
+        ]
+        return [future.result() for future in futures]
+
+def estimate_row_bytes(generator='improved', sample_size=2000):
+    """Estimate peak bytes per generated row (DataFrame plus working arrays)"""
+    sample = GENERATORS[generator](sample_size, rng=np.random.default_rng(0))
+    frame_bytes = sample.memory_usage(deep=True).sum() / sample_size
+    # Column draws, intermediates and the CSV text buffer roughly triple the frame
+    return int(frame_bytes * 3)
+
+def chunk_size_for_memory(max_memory_mb, generator='improved'):
+    """Largest chunk size whose working set stays under max_memory_mb"""
+    return max(1000, int(max_memory_mb * 1024 ** 2 // estimate_row_bytes(generator)))
+
+def iter_cohort_chunks(n_patients, chunk_size=100_000, seed=42, generator='improved', id_width=None):
+    """
+    Yield a cohort as fixed-size DataFrame chunks
+
+    Chunks use the same seeding as plan_shards(), so streaming with
+    chunk_size=S produces the same rows as sharding with shard_size=S.
+    """
+    if id_width is None:
+        id_width = patient_id_width(n_patients)
+    for shard in plan_shards(n_patients, chunk_size, seed):
+        yield generate_shard(shard, generator, id_width)
+
+def write_cohort_stream(path, n_patients, chunk_size=None, max_memory_mb=256, seed=42,
+                        generator='improved', typed=True):
+    """
+    Append a cohort to one CSV chunk by chunk; peak memory is bounded by the chunk
+
+    With typed=True a typed Parquet copy is streamed alongside the CSV.
+    """
+
+    if chunk_size is None:
+        chunk_size = chunk_size_for_memory(max_memory_mb, generator)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    typed_writer = TypedDatasetWriter(path) if typed and parquet_available() else None
+    n_written = 0
+    try:
+        with open(path, 'w', newline='') as f:
+            for chunk in iter_cohort_chunks(n_patients, chunk_size, seed, generator):
+                chunk.to_csv(f, index=False, header=(n_written == 0))
+                if typed_writer is not None:
+                    typed_writer.write(chunk)
+                n_written += len(chunk)
+    finally:
+        if typed_writer is not None:
+            typed_writer.close()
+    return n_written
+
+def write_train_test_stream(n_train=800, n_test=200, train_path='data/fall_risk_train.csv',
+                            test_path='data/fall_risk_test.csv', chunk_size=None,
+                            max_memory_mb=256, seed=42, generator='improved'):
+    """Stream the train/test split to CSV; each file numbers its patients from PT0001"""
+
+    train_seed, test_seed = np.random.SeedSequence(seed).spawn(2)
+    return (
+        write_cohort_stream(train_path, n_train, chunk_size, max_memory_mb, train_seed, generator),
+        write_cohort_stream(test_path, n_test, chunk_size, max_memory_mb, test_seed, generator)
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate large synthetic fall risk cohorts")
+    parser.add_argument('--mode', choices=['sharded', 'stream', 'train-test', 'targeted'], default='sharded',
+                        help="sharded: one file per shard; stream: one file written chunk by chunk; "
+                             "train-test: stream data/fall_risk_train.csv and data/fall_risk_test.csv; "
+                             "targeted: one file with a fixed class mix (see --target-*)")
+    parser.add_argument('--n-patients', type=int, default=1000, help="Total patients to generate")
+    parser.add_argument('--n-test', type=int, default=200, help="Test patients (train-test mode)")
+    parser.add_argument('--shard-size', type=int, default=100_000, help="Patients per output file")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="Patients per streamed chunk (default: derived from --max-memory-mb)")
+    parser.add_argument('--max-memory-mb', type=float, default=256,
+                        help="Memory ceiling for one streamed chunk")
+    parser.add_argument('--output', default='data/fall_risk_cohort.csv', help="Output file (stream mode)")
+    parser.add_argument('--target-column', default='actual_fall_6months', help="Column to target (targeted mode)")
+    parser.add_argument('--target-value', default='1', help="Value to over/under-sample, e.g. 1 or High")
+    parser.add_argument('--target-share', type=float, default=0.5, help="Share of rows with the target value")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42, help="Master seed for all shards")
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='improved')
+    parser.add_argument('--out-dir', default='data')
+    parser.add_argument('--prefix', default='fall_risk')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print(f"🏥 Generating Fall Risk Cohort ({args.mode})...")
+    print("=" * 60)
+    print(f"   Patients: {args.n_patients:,}")
+    print(f"   Generator: {args.generator} (seed {args.seed})")
+
+    start = time.perf_counter()
+    if args.mode == 'stream':
+        n_written = write_cohort_stream(
+            args.output,
+            args.n_patients,
+            chunk_size=args.chunk_size,
+            max_memory_mb=args.max_memory_mb,
+            seed=args.seed,
+            generator=args.generator
+        )
+        print(f"\n✅ {n_written:,} patients streamed to {args.output}")
+    elif args.mode == 'train-test':
+        n_train, n_test = write_train_test_stream(
+            args.n_patients,
+            args.n_test,
+            train_path=os.path.join(args.out_dir, 'fall_risk_train.csv'),
+            test_path=os.path.join(args.out_dir, 'fall_risk_test.csv'),
+            chunk_size=args.chunk_size,
+            max_memory_mb=args.max_memory_mb,
+            seed=args.seed,
+            generator=args.generator
+        )
+        print(f"\n✅ Training data: {n_train:,} patients")
+        print(f"✅ Test data: {n_test:,} patients")
+        n_written = n_train + n_test
+    elif args.mode == 'targeted':
+        target_value = int(args.target_value) if args.target_value.isdigit() else args.target_value
+        try:
+            cohort = generate_data_improved.generate_targeted_cohort(
+                args.n_patients,
+                column=args.target_column,
+                value=target_value,
+                share=args.target_share,
+                rng=np.random.default_rng(args.seed),
+                id_width=patient_id_width(args.n_patients)
+            )
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        write_dataset(cohort, args.output)
+        n_written = len(cohort)
+        print(f"\n✅ {n_written:,} patients written to {args.output}")
+        print(f"   {args.target_column} == {target_value}: {args.target_share*100:.0f}% of rows")
+    else:
+        written = generate_sharded(
+            args.n_patients,
+            out_dir=args.out_dir,
+            prefix=args.prefix,
+            shard_size=args.shard_size,
+            workers=args.workers,
+            seed=args.seed,
+            generator=args.generator
+        )
+        n_written = args.n_patients
+        print(f"\n✅ {len(written)} shard(s) written to {args.out_dir}/")
+    elapsed = time.perf_counter() - start
+
+    # Every row written, test rows included
+    print(f"⏱️  {elapsed:.1f}s ({n_written / elapsed:,.0f} patients/sec)")
@@ -3,12 +3,17 @@ import numpy as np
 from datetime import datetime, timedelta
 import random
 
+from dataset_io import write_dataset
+
 np.random.seed(42)
 random.seed(42)
 
-def generate_fall_risk_data(n_patients=1000):
+def generate_fall_risk_data(n_patients=1000, columnar=False):
     """Generate synthetic elderly care data for fall risk assessment"""
     
+    if columnar:
+        return generate_fall_risk_data_columnar(n_patients)
+    
     data = []
     
     for patient_id in range(1, n_patients + 1):
@@ -113,16 +118,160 @@ def generate_fall_risk_data(n_patients=1000):
     
     return pd.DataFrame(data)
 
+def generate_fall_risk_data_columnar(n_patients=1000, start_id=1, rng=None, id_width=4):
+    """Generate the same dataset column by column (one NumPy call per column)"""
+    
+    if rng is None:
+        # Derive from the global seed so np.random.seed() keeps runs reproducible
+        rng = np.random.default_rng(np.random.randint(0, 2**31 - 1))
+    
+    n = n_patients
+    
+    # Demographics
+    age = rng.integers(65, 95, size=n)
+    gender = np.array(['Female', 'Male'], dtype=object)[rng.integers(0, 2, size=n)]
+    
+    # Physical factors
+    bmi = np.clip(rng.normal(27, 4.5, size=n), 18, 40)
+    
+    # Mobility & Balance (0-10 scale, lower = worse)
+    gait_speed = np.clip(rng.normal(5, 2, size=n), 0, 10)
+    balance_score = np.clip(rng.normal(5, 2.5, size=n), 0, 10)
+    muscle_strength = np.clip(rng.normal(5, 2, size=n), 0, 10)
+    
+    # Medical history
+    previous_falls = np.minimum(rng.poisson(1.5, size=n), 10)
+    num_medications = np.minimum(rng.poisson(5, size=n), 15)
+    
+    # Medications, chronic conditions, vision, environment (fair coin flips)
+    flags = rng.integers(0, 2, size=(9, n))
+    (takes_sedatives, takes_blood_pressure_meds, has_arthritis,
+     has_osteoporosis, has_parkinsons, has_diabetes, vision_impairment,
+     uses_walking_aid, lives_alone) = flags
+    
+    cognitive_score = np.clip(rng.normal(7, 2, size=n), 0, 10)
+    home_hazards = rng.integers(0, 8, size=n)
+    activity_level = np.clip(rng.normal(5, 2, size=n), 0, 10)
+    
+    # Ground truth fall risk
+    risk_score = calculate_risk_score_array(
+        age, gait_speed, balance_score, muscle_strength,
+        previous_falls, num_medications, takes_sedatives,
+        has_arthritis, has_osteoporosis, has_parkinsons,
+        vision_impairment, cognitive_score, uses_walking_aid,
+        home_hazards, activity_level
+    )
+    
+    # Risk category (<30 Low, <60 Medium, otherwise High)
+    risk_category = np.array(['Low', 'Medium', 'High'], dtype=object)[np.searchsorted([30, 60], risk_score, side='right')]
+    
+    # Simulate actual fall in next 6 months (based on risk)
+    actual_fall = (rng.random(n) < risk_score / 100 * 0.8).astype(int)
+    
+    ids = np.arange(start_id, start_id + n).astype(str)
+    
+    return pd.DataFrame({
+        'patient_id': np.char.add('PT', np.char.zfill(ids, id_width)),
+        'age': age,
+        'gender': gender,
+        'bmi': np.round(bmi, 1),
+        'gait_speed': np.round(gait_speed, 1),
+        'balance_score': np.round(balance_score, 1),
+        'muscle_strength': np.round(muscle_strength, 1),
+        'previous_falls': previous_falls,
+        'num_medications': num_medications,
+        'takes_sedatives': takes_sedatives,
+        'takes_blood_pressure_meds': takes_blood_pressure_meds,
+        'has_arthritis': has_arthritis,
+        'has_osteoporosis': has_osteoporosis,
+        'has_parkinsons': has_parkinsons,
+        'has_diabetes': has_diabetes,
+        'vision_impairment': vision_impairment,
+        'cognitive_score': np.round(cognitive_score, 1),
+        'uses_walking_aid': uses_walking_aid,
+        'lives_alone': lives_alone,
+        'home_hazards': home_hazards,
+        'activity_level': np.round(activity_level, 1),
+        'risk_score': np.round(risk_score, 1),
+        'risk_category': risk_category,
+        'actual_fall_6months': actual_fall
+    })
+
+RISK_SCORE_COLUMNS = [
+    'age', 'gait_speed', 'balance_score', 'muscle_strength',
+    'previous_falls', 'num_medications', 'takes_sedatives',
+    'has_arthritis', 'has_osteoporosis', 'has_parkinsons',
+    'vision_impairment', 'cognitive_score', 'uses_walking_aid',
+    'home_hazards', 'activity_level'
+]
+
+# Age bands: <75 -> 5, 75-79 -> 8, 80-84 -> 12, 85+ -> 15 points
+AGE_BAND_EDGES = np.array([75, 80, 85])
+AGE_BAND_POINTS = np.array([5, 8, 12, 15])
+
+def calculate_risk_score_array(age, gait_speed, balance_score, muscle_strength,
+                               previous_falls, num_medications, takes_sedatives,
+                               has_arthritis, has_osteoporosis, has_parkinsons,
+                               vision_impairment, cognitive_score, uses_walking_aid,
+                               home_hazards, activity_level):
+    """Calculate fall risk scores (0-100) for whole arrays of patients"""
+    
+    age = np.asarray(age)
+    
+    # Age factor (0-15 points)
+    score = AGE_BAND_POINTS[np.searchsorted(AGE_BAND_EDGES, age, side='right')].astype(float)
+    
+    # Mobility factors (0-30 points)
+    score += (10 - np.asarray(gait_speed)) * 1.5  # Slower gait = higher risk
+    score += (10 - np.asarray(balance_score)) * 1.5  # Poor balance = higher risk
+    score += (10 - np.asarray(muscle_strength)) * 1.0  # Weak muscles = higher risk
+    
+    # Fall history (0-15 points)
+    score += np.asarray(previous_falls) * 3
+    
+    # Medications (0-10 points)
+    score += np.minimum(np.asarray(num_medications) * 0.5, 8)
+    score += np.where(takes_sedatives, 5, 0)
+    
+    # Chronic conditions (0-15 points)
+    score += np.asarray(has_arthritis) * 3
+    score += np.asarray(has_osteoporosis) * 4
+    score += np.asarray(has_parkinsons) * 6
+    
+    # Vision & Cognitive (0-10 points)
+    score += np.asarray(vision_impairment) * 4
+    score += (10 - np.asarray(cognitive_score)) * 0.6
+    
+    # Environmental (0-5 points)
+    score += np.asarray(uses_walking_aid) * 2
+    score += np.asarray(home_hazards) * 0.5
+    
+    # Protective factors (reduce risk)
+    score -= np.asarray(activity_level) * 0.3
+    
+    # Cap at 0-100
+    return np.clip(score, 0, 100)
+
+def calculate_risk_score_frame(df):
+    """Calculate fall risk scores for every row of a DataFrame (or dict of arrays)"""
+    return calculate_risk_score_array(*(np.asarray(df[col]) for col in RISK_SCORE_COLUMNS))
+
 def calculate_risk_score(age, gait_speed, balance_score, muscle_strength,
                         previous_falls, num_medications, takes_sedatives,
                         has_arthritis, has_osteoporosis, has_parkinsons,
                         vision_impairment, cognitive_score, uses_walking_aid,
                         home_hazards, activity_level):
-    """Calculate fall risk score (0-100)"""
+    """
+    Calculate fall risk score (0-100) for a single patient
+
+    Plain Python on scalars: for the row loop, building arrays for one
+    patient costs more than the arithmetic. Same results as
+    calculate_risk_score_array.
+    """
     
     score = 0
     
-    # Age factor (0-15 points)
+    # Age factor (0-15 points, the AGE_BAND_* table)
     if age >= 85:
         score += 15
     elif age >= 80:
@@ -162,7 +311,7 @@ def calculate_risk_score(age, gait_speed, balance_score, muscle_strength,
     score -= activity_level * 0.3
     
     # Cap at 0-100
-    return max(0, min(100, score))
+    return float(max(0, min(100, score)))
 
 if __name__ == "__main__":
     print("🏥 Generating Fall Risk Assessment Dataset...")
@@ -171,9 +320,9 @@ if __name__ == "__main__":
     train_data = generate_fall_risk_data(800)
     test_data = generate_fall_risk_data(200)
     
-    # Save to CSV
-    train_data.to_csv('data/fall_risk_train.csv', index=False)
-    test_data.to_csv('data/fall_risk_test.csv', index=False)
+    # Save to CSV (plus typed Parquet copies)
+    write_dataset(train_data, 'data/fall_risk_train.csv')
+    write_dataset(test_data, 'data/fall_risk_test.csv')
     
     print(f"✅ Training data: {len(train_data)} patients")
     print(f"✅ Test data: {len(test_data)} patients")
@@ -2,12 +2,17 @@ import pandas as pd
 import numpy as np
 import random
 
+from dataset_io import write_dataset
+
 np.random.seed(42)
 random.seed(42)
 
-def generate_fall_risk_data(n_patients=1000):
+def generate_fall_risk_data(n_patients=1000, columnar=False):
     """Generate synthetic elderly care data with realistic correlations"""
     
+    if columnar:
+        return generate_fall_risk_data_columnar(n_patients)
+    
     data = []
     
     for patient_id in range(1, n_patients + 1):
@@ -126,6 +131,240 @@ def generate_fall_risk_data(n_patients=1000):
     
     return pd.DataFrame(data)
 
+def generate_fall_risk_data_columnar(n_patients=1000, start_id=1, rng=None, id_width=4):
+    """Generate the same correlated dataset column by column (one NumPy call per column)"""
+    
+    if rng is None:
+        # Derive from the global seed so np.random.seed() keeps runs reproducible
+        rng = np.random.default_rng(np.random.randint(0, 2**31 - 1))
+    
+    n = n_patients
+    
+    # Demographics
+    age = rng.integers(65, 95, size=n)
+    gender = np.array(['Female', 'Male'], dtype=object)[rng.integers(0, 2, size=n)]
+    
+    # Age strongly correlates with other factors
+    age_factor = (age - 65) / 30  # 0 to 1 scale
+    
+    # Physical factors (worse with age)
+    bmi = np.clip(rng.normal(27, 4.5, size=n), 18, 40)
+    gait_speed = np.clip(rng.normal(7 - age_factor * 4, 1.5), 0, 10)
+    balance_score = np.clip(rng.normal(7 - age_factor * 4, 1.5), 0, 10)
+    muscle_strength = np.clip(rng.normal(7 - age_factor * 3, 1.5), 0, 10)
+    
+    # Previous falls (those with poor mobility have more falls)
+    mobility_risk = (10 - gait_speed) + (10 - balance_score)
+    previous_falls = np.minimum(rng.poisson(mobility_risk / 4), 10)
+    
+    # Medications (more with age and conditions)
+    num_medications = np.minimum(rng.poisson(3 + age_factor * 4), 15)
+    
+    # Risk medications, chronic conditions and vision share one uniform draw
+    u = rng.random((9, n))
+    takes_sedatives = (u[0] < num_medications / 20).astype(int)
+    takes_blood_pressure_meds = (u[1] < num_medications / 15).astype(int)
+    has_arthritis = (u[2] < 0.3 + age_factor * 0.4).astype(int)
+    has_osteoporosis = (u[3] < 0.2 + age_factor * 0.3).astype(int)
+    has_parkinsons = (u[4] < 0.05 + age_factor * 0.15).astype(int)
+    has_diabetes = (u[5] < 0.25).astype(int)
+    vision_impairment = (u[6] < 0.2 + age_factor * 0.3).astype(int)
+    cognitive_score = np.clip(rng.normal(8 - age_factor * 3, 1.5), 0, 10)
+    
+    # Environmental
+    uses_walking_aid = ((gait_speed < 5) | (balance_score < 5) | (previous_falls > 2)).astype(int)
+    lives_alone = (u[7] < 0.4).astype(int)
+    home_hazards = np.minimum(rng.poisson(2 + (10 - gait_speed) * 0.5), 10)
+    
+    # Activity level (protective, decreases with age/poor health)
+    activity_level = np.clip(
+        rng.normal(8 - age_factor * 3 - (has_arthritis * 1) - (has_parkinsons * 2), 1.5),
+        0, 10
+    )
+    
+    fall_probability = calculate_fall_probability_array(
+        age, gait_speed, balance_score, muscle_strength,
+        previous_falls, num_medications, takes_sedatives,
+        has_arthritis, has_osteoporosis, has_parkinsons,
+        vision_impairment, cognitive_score, uses_walking_aid,
+        home_hazards, activity_level, lives_alone
+    )
+    actual_fall = (u[8] < fall_probability).astype(int)
+    risk_score = fall_probability * 100
+    
+    # Risk category (<30 Low, <60 Medium, otherwise High)
+    risk_category = np.array(['Low', 'Medium', 'High'], dtype=object)[np.searchsorted([30, 60], risk_score, side='right')]
+    
+    ids = np.arange(start_id, start_id + n).astype(str)
+    
+    return pd.DataFrame({
+        'patient_id': np.char.add('PT', np.char.zfill(ids, id_width)),
+        'age': age,
+        'gender': gender,
+        'bmi': np.round(bmi, 1),
+        'gait_speed': np.round(gait_speed, 1),
+        'balance_score': np.round(balance_score, 1),
+        'muscle_strength': np.round(muscle_strength, 1),
+        'previous_falls': previous_falls,
+        'num_medications': num_medications,
+        'takes_sedatives': takes_sedatives,
+        'takes_blood_pressure_meds': takes_blood_pressure_meds,
+        'has_arthritis': has_arthritis,
+        'has_osteoporosis': has_osteoporosis,
+        'has_parkinsons': has_parkinsons,
+        'has_diabetes': has_diabetes,
+        'vision_impairment': vision_impairment,
+        'cognitive_score': np.round(cognitive_score, 1),
+        'uses_walking_aid': uses_walking_aid,
+        'lives_alone': lives_alone,
+        'home_hazards': home_hazards,
+        'activity_level': np.round(activity_level, 1),
+        'risk_score': np.round(risk_score, 1),
+        'risk_category': risk_category,
+        'actual_fall_6months': actual_fall
+    })
+
+# Rows drawn before the acceptance rate is trusted to rule a quota out of reach
+MIN_RATE_ROWS = 1_000_000
+
+# Most rows drawn per row kept before a quota is declared out of reach
+MAX_OVERSAMPLING = 1000
+
+def generate_targeted_cohort(n_patients, column='actual_fall_6months', value=1, share=0.5,
+                             rng=None, min_batch=10_000, max_batch=1_000_000, id_width=4):
+    """
+    Generate a cohort in which a fixed share of rows has column == value
+    (e.g. 50% fallers, or 30% risk_category == 'High')
+
+    Rows are drawn in vectorized batches and accepted per stratum until both
+    quotas are full. Each batch is sized from the acceptance rate seen so far,
+    so only a handful of batches are needed even for rare strata. The
+    sampling_weight column holds population share / sample share for the
+    row's stratum, so weighted statistics recover the natural population.
+    An unknown column, a value outside a text column's categories, or a
+    quota that the rate seen over MIN_RATE_ROWS rows puts beyond
+    MAX_OVERSAMPLING rows per patient (e.g. a value that never occurs)
+    raises ValueError.
+    """
+    
+    if not 0 <= share <= 1:
+        raise ValueError(f"share must be between 0 and 1, got {share}")
+    if rng is None:
+        rng = np.random.default_rng(np.random.randint(0, 2**31 - 1))
+    
+    need_target = int(round(n_patients * share))
+    need_rest = n_patients - need_target
+    max_rows = max(MIN_RATE_ROWS, MAX_OVERSAMPLING * n_patients)
+    seen_total = 0
+    seen_target = 0
+    target_parts, rest_parts = [], []
+    
+    while need_target > 0 or need_rest > 0:
+        # Laplace-smoothed acceptance rate for the target stratum
+        rate = (seen_target + 1) / (seen_total + 2)
+        wanted = max(need_target / rate, need_rest / (1 - rate)) * 1.1
+        if seen_total >= MIN_RATE_ROWS and seen_total + wanted > max_rows:
+            raise ValueError(
+                f"{column} == {value!r} occurred in {seen_target:,} of {seen_total:,} generated rows; "
+                f"a {share:.0%} share of {n_patients:,} patients would need more than {max_rows:,} rows"
+            )
+        batch_size = int(min(max_batch, max(min_batch, wanted)))
+        
+        batch = generate_fall_risk_data_columnar(batch_size, rng=rng)
+        if column not in batch.columns:
+            raise ValueError(f"Unknown column '{column}'; choose one of {list(batch.columns)}")
+        if seen_total == 0 and not pd.api.types.is_numeric_dtype(batch[column]):
+            categories = sorted(batch[column].unique())
+            if value not in categories:
+                raise ValueError(f"{column} takes only the values {categories}, not {value!r}")
+        is_target = (batch[column] == value).to_numpy()
+        seen_total += batch_size
+        seen_target += int(is_target.sum())
+        
+        taken = batch[is_target].iloc[:need_target]
+        target_parts.append(taken)
+        need_target -= len(taken)
+        
+        taken = batch[~is_target].iloc[:need_rest]
+        rest_parts.append(taken)
+        need_rest -= len(taken)
+    
+    population_share = seen_target / seen_total
+    target_rows = pd.concat(target_parts, ignore_index=True)
+    rest_rows = pd.concat(rest_parts, ignore_index=True)
+    if len(target_rows):
+        target_rows['sampling_weight'] = population_share / share
+    if len(rest_rows):
+        rest_rows['sampling_weight'] = (1 - population_share) / (1 - share)
+    
+    # Interleave the strata and renumber patients
+    cohort = pd.concat([target_rows, rest_rows], ignore_index=True)
+    cohort = cohort.iloc[rng.permutation(len(cohort))].reset_index(drop=True)
+    ids = np.arange(1, len(cohort) + 1).astype(str)
+    cohort['patient_id'] = np.char.add('PT', np.char.zfill(ids, id_width))
+    
+    return cohort
+
+FALL_PROBABILITY_COLUMNS = [
+    'age', 'gait_speed', 'balance_score', 'muscle_strength',
+    'previous_falls', 'num_medications', 'takes_sedatives',
+    'has_arthritis', 'has_osteoporosis', 'has_parkinsons',
+    'vision_impairment', 'cognitive_score', 'uses_walking_aid',
+    'home_hazards', 'activity_level', 'lives_alone'
+]
+
+def calculate_fall_probability_array(age, gait_speed, balance_score, muscle_strength,
+                                     previous_falls, num_medications, takes_sedatives,
+                                     has_arthritis, has_osteoporosis, has_parkinsons,
+                                     vision_impairment, cognitive_score, uses_walking_aid,
+                                     home_hazards, activity_level, lives_alone):
+    """
+    Calculate realistic fall probabilities for whole arrays of patients
+    Returns an array of probabilities between 0 and 1
+    """
+    
+    # Age (0-20 points)
+    risk_score = (np.asarray(age) - 65) * 0.5
+    
+    # Mobility & Balance (STRONGEST PREDICTORS) (0-40 points)
+    risk_score += (10 - np.asarray(gait_speed)) * 2.5
+    risk_score += (10 - np.asarray(balance_score)) * 2.5
+    risk_score += (10 - np.asarray(muscle_strength)) * 1.0
+    
+    # Previous falls (VERY STRONG PREDICTOR) (0-30 points)
+    risk_score += np.asarray(previous_falls) * 5
+    
+    # Medications (0-15 points)
+    risk_score += np.asarray(num_medications) * 0.8
+    risk_score += np.asarray(takes_sedatives) * 8
+    
+    # Chronic conditions (0-20 points)
+    risk_score += np.asarray(has_arthritis) * 4
+    risk_score += np.asarray(has_osteoporosis) * 6
+    risk_score += np.asarray(has_parkinsons) * 10
+    
+    # Sensory & Cognitive (0-10 points)
+    risk_score += np.asarray(vision_impairment) * 5
+    risk_score += (10 - np.asarray(cognitive_score)) * 0.5
+    
+    # Environmental (0-10 points)
+    risk_score += np.asarray(uses_walking_aid) * 3
+    risk_score += np.asarray(home_hazards) * 0.8
+    risk_score += np.asarray(lives_alone) * 2
+    
+    # Protective factor
+    risk_score -= np.asarray(activity_level) * 1.5
+    
+    # Convert to probability using logistic function
+    # Center around 50 and scale
+    probability = 1 / (1 + np.exp(-(risk_score - 50) / 15))
+    
+    return probability
+
+def calculate_fall_probability_frame(df):
+    """Calculate fall probabilities for every row of a DataFrame (or dict of arrays)"""
+    return calculate_fall_probability_array(*(np.asarray(df[col]) for col in FALL_PROBABILITY_COLUMNS))
+
 def calculate_fall_probability(age, gait_speed, balance_score, muscle_strength,
                                previous_falls, num_medications, takes_sedatives,
                                has_arthritis, has_osteoporosis, has_parkinsons,
@@ -134,13 +373,14 @@ def calculate_fall_probability(age, gait_speed, balance_score, muscle_strength,
     """
     Calculate realistic fall probability using logistic-like function
     Returns probability between 0 and 1
+
+    Plain Python on scalars: for the row loop, building arrays for one
+    patient costs more than the arithmetic. Same results as
+    calculate_fall_probability_array.
     """
     
-    # Base risk
-    risk_score = 0
-    
     # Age (0-20 points)
-    risk_score += (age - 65) * 0.5
+    risk_score = (age - 65) * 0.5
     
     # Mobility & Balance (STRONGEST PREDICTORS) (0-40 points)
     risk_score += (10 - gait_speed) * 2.5
@@ -173,9 +413,7 @@ def calculate_fall_probability(age, gait_speed, balance_score, muscle_strength,
     
     # Convert to probability using logistic function
     # Center around 50 and scale
-    probability = 1 / (1 + np.exp(-(risk_score - 50) / 15))
-    
-    return probability
+    return float(1 / (1 + np.exp(-(risk_score - 50) / 15)))
 
 if __name__ == "__main__":
     print("🏥 Generating IMPROVED Fall Risk Assessment Dataset...")
@@ -185,9 +423,9 @@ if __name__ == "__main__":
     train_data = generate_fall_risk_data(800)
     test_data = generate_fall_risk_data(200)
     
-    # Save to CSV
-    train_data.to_csv('data/fall_risk_train.csv', index=False)
-    test_data.to_csv('data/fall_risk_test.csv', index=False)
+    # Save to CSV (plus typed Parquet copies)
+    write_dataset(train_data, 'data/fall_risk_train.csv')
+    write_dataset(test_data, 'data/fall_risk_test.csv')
     
     print(f"✅ Training data: {len(train_data)} patients")
     print(f"✅ Test data: {len(test_data)} patients")
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from threadpoolctl import threadpool_limits
+
+# Fitted models and held-out data shared with worker processes once
+WORKER_DATA = {}
+
+def init_worker(models, X, y):
+    WORKER_DATA['models'] = models
+    WORKER_DATA['X'] = X
+    WORKER_DATA['y'] = y
+    # Parallelism comes from the pool; threaded estimators get one core per worker
+    threadpool_limits(limits=1)
+
+def score(model, X, y):
+    return roc_auc_score(y, model.predict_proba(X)[:, 1])
+
+def permutation_repeat(seed):
+    """
+    AUC drop of every model for every feature, for one set of shuffles
+
+    Each feature's column is shuffled once, in place in a single working
+    copy, and that matrix is scored by all models before the column is
+    restored, so every model sees exactly the same permutations.
+    """
+    models, X, y = WORKER_DATA['models'], WORKER_DATA['X'], WORKER_DATA['y']
+    rng = np.random.default_rng(seed)
+    baseline = {name: score(model, X, y) for name, model in models.items()}
+
+    X_perm = X.copy()
+    drops = {name: np.empty(X.shape[1]) for name in models}
+    for j in range(X.shape[1]):
+        X_perm[:, j] = X[rng.permutation(len(X)), j]
+        for name, model in models.items():
+            drops[name][j] = baseline[name] - score(model, X_perm, y)
+        X_perm[:, j] = X[:, j]
+    return drops
+
+def permutation_importance(models, X, y, feature_names, n_repeats=10, max_samples=None,
+                           seed=42, workers=None):
+    """
+    Permutation importance (drop in test AUC) for several fitted models
+
+    Repeats run in parallel on a process pool, each with its own child
+    seed; results depend only on seed, not on the number of workers.
+    max_samples subsamples large test sets before anything is shuffled.
+    """
+    X = np.ascontiguousarray(X)
+    y = np.asarray(y)
+    if max_samples and len(X) > max_samples:
+        rows = np.random.default_rng(seed).choice(len(X), max_samples, replace=False)
+        X, y = X[rows], y[rows]
+
+    seeds = np.random.SeedSequence(seed).spawn(n_repeats)
+    workers = min(workers or os.cpu_count() or 1, n_repeats)
+    if workers == 1:
+        init_worker(models, X, y)
+        repeats = [permutation_repeat(s) for s in seeds]
+        WORKER_DATA.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(models, X, y)) as pool:
+            repeats = list(pool.map(permutation_repeat, seeds))
+
+    importances = {}
+    for name in models:
+        drops = np.array([repeat[name] for repeat in repeats])
+        importances[name] = {
+            'mean': drops.mean(axis=0).tolist(),
+            'std': drops.std(axis=0).tolist()
+        }
+
+    return {
+        'metric': 'auc_drop',
+        'n_repeats': n_repeats,
+        'n_samples': len(X),
+        'feature_names': list(feature_names),
+        'models': importances
+    }
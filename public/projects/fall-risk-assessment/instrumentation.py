@@ -0,0 +1,186 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages currently open in this process (across all timers), innermost last
+OPEN_STAGES = []
+
+def cpu_seconds():
+    """User + system CPU time of this process and its finished child processes"""
+    if resource is None:
+        return time.process_time()
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+class RSSMemory:
+    """
+    Peak resident memory via /proc (Linux)
+
+    Writing 5 to clear_refs resets the kernel's high-water mark (VmHWM),
+    so per-stage peaks cost nothing while the stage runs and include
+    native buffers that tracemalloc never sees.
+    """
+    name = 'rss'
+
+    @staticmethod
+    def available():
+        try:
+            RSSMemory().reset()
+            RSSMemory().read()
+            return True
+        except (OSError, KeyError):
+            return False
+
+    def start(self):
+        return False
+
+    def stop(self):
+        pass
+
+    def read(self):
+        """(current, peak) in bytes"""
+        values = {}
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key, kb = line.split()[:2]
+                    values[key] = int(kb) * 1024
+        return values['VmRSS:'], values['VmHWM:']
+
+    def reset(self):
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+
+class TracedMemory:
+    """Peak Python/NumPy allocations from tracemalloc; portable, but slows allocation-heavy code"""
+    name = 'tracemalloc'
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start()
+        return True
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def read(self):
+        return tracemalloc.get_traced_memory()
+
+    def reset(self):
+        tracemalloc.reset_peak()
+
+class StageTimer:
+    """
+    Wall time, CPU time and peak memory for named pipeline stages
+
+    Stages may nest. The memory peak is reset when a stage opens, and a
+    finished stage's peak is carried up to the stage around it, so every
+    stage reports the most memory it used on top of what was already live
+    when it opened. Memory is resident memory where /proc allows resetting
+    its peak, traced Python allocations otherwise, and covers this process
+    only; CPU time includes worker processes that exited during the stage.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.memory = None
+        if trace_memory:
+            self.memory = RSSMemory() if RSSMemory.available() else TracedMemory()
+        self.records = []
+        self.depth = 0
+
+    @contextmanager
+    def stage(self, name):
+        started_tracing = False
+        baseline = 0
+        if self.memory is not None:
+            started_tracing = self.memory.start()
+            if OPEN_STAGES:
+                OPEN_STAGES[-1]['peak'] = max(OPEN_STAGES[-1]['peak'], self.memory.read()[1])
+            self.memory.reset()
+            baseline = self.memory.read()[0]
+
+        # Appended now so records stay in the order stages were opened
+        record = {
+            'stage': name,
+            'depth': self.depth,
+            'started': datetime.now().isoformat(timespec='seconds')
+        }
+        self.records.append(record)
+        frame = {'peak': 0}
+        OPEN_STAGES.append(frame)
+        self.depth += 1
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = cpu_seconds() - cpu_start
+            OPEN_STAGES.pop()
+            self.depth -= 1
+
+            peak_mb = None
+            if self.memory is not None:
+                peak = max(frame['peak'], self.memory.read()[1])
+                peak_mb = max(peak - baseline, 0) / 1024 ** 2
+                if OPEN_STAGES:
+                    OPEN_STAGES[-1]['peak'] = max(OPEN_STAGES[-1]['peak'], peak)
+                if started_tracing:
+                    self.memory.stop()
+
+            record.update({'wall_s': wall, 'cpu_s': cpu, 'peak_mb': peak_mb})
+
+    def add(self, records, prefix='', depth=0):
+        """Merge records measured elsewhere (e.g. in a worker process) at the given nesting depth"""
+        for record in records:
+            self.records.append({**record, 'stage': prefix + record['stage'],
+                                 'depth': depth + record.get('depth', 0)})
+
+    def summary(self):
+        """Per-stage table plus the top-level stage that dominated wall time"""
+        stages = [
+            {key: record[key] for key in ('stage', 'depth', 'wall_s', 'cpu_s', 'peak_mb')}
+            for record in self.records if 'wall_s' in record
+        ]
+        top_level = [s for s in stages if s['depth'] == 0]
+        slowest = max(top_level, key=lambda s: s['wall_s'])['stage'] if top_level else None
+        return {
+            'slowest_stage': slowest,
+            'total_wall_s': sum(s['wall_s'] for s in top_level),
+            'total_cpu_s': sum(s['cpu_s'] for s in top_level),
+            'memory': self.memory.name if self.memory is not None else None,
+            'stages': stages
+        }
+
+    def report(self):
+        for record in self.records:
+            if 'wall_s' not in record:
+                continue
+            name = '  ' * record['depth'] + record['stage']
+            memory = f"{record['peak_mb']:8.1f} MB" if record['peak_mb'] is not None else ""
+            print(f"   {name:48s} {record['wall_s']:8.3f}s wall {record['cpu_s']:8.3f}s cpu {memory}")
+
+    def write_log(self, path, run_info=None):
+        """Append this run (one JSON line) to the run log"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        entry = {
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            **(run_info or {}),
+            'memory': self.memory.name if self.memory is not None else None,
+            'stages': self.records
+        }
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
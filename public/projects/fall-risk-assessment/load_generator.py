@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from batch_scoring import PASSTHROUGH_COLUMNS
+from dataset_io import load_dataset
+
+async def request(reader, writer, host, method, path, body=b''):
+    """One keep-alive HTTP/1.1 exchange; returns (status, parsed JSON body)"""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    length = 0
+    for line in header_lines:
+        if line.lower().startswith('content-length:'):
+            length = int(line.split(':', 1)[1])
+    payload = await reader.readexactly(length)
+    return int(status_line.split(' ')[1]), json.loads(payload)
+
+async def client(host, port, bodies, latencies, errors):
+    """Send bodies back to back over one connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, 'POST', '/score', body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def run_load(url, records, n_requests, concurrency):
+    """Fire n_requests single-patient calls from concurrency connections; client and server stats"""
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    bodies = [json.dumps(records[i % len(records)]).encode() for i in range(n_requests)]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, bodies[i::concurrency], latencies, errors)
+                           for i in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, server_stats = await request(reader, writer, host, 'GET', '/stats')
+    writer.close()
+
+    p50, p90, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 90, 99])
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'seconds': seconds,
+        'requests_per_sec': n_requests / seconds,
+        'client_latency_ms': {'p50': p50, 'p90': p90, 'p99': p99},
+        'server': server_stats
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the scoring service with concurrent single-patient calls")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--data', default='data/fall_risk_test.csv',
+                        help="Patients to replay (cycled if fewer than --requests)")
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help="Open connections, each sending requests back to back")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    df = load_dataset(args.data)
+    records = json.loads(df.drop(columns=[c for c in PASSTHROUGH_COLUMNS if c in df.columns]).to_json(orient='records'))
+
+    print(f"🚦 {args.requests:,} requests, {args.concurrency} connections → {args.url}")
+    result = asyncio.run(run_load(args.url, records, args.requests, args.concurrency))
+
+    client_ms = result['client_latency_ms']
+    server = result['server']
+    print(f"   Throughput: {result['requests_per_sec']:,.0f} req/s ({result['errors']} errors)")
+    print(f"   Client latency: p50 {client_ms['p50']:.2f} ms, p90 {client_ms['p90']:.2f} ms, p99 {client_ms['p99']:.2f} ms")
+    print(f"   Server latency: p50 {server['latency_ms']['p50']:.2f} ms, p99 {server['latency_ms']['p99']:.2f} ms")
+    print(f"   Batches: {server['batches']:,}, mean size {server['mean_batch_size']:.1f}, max {server['max_batch_size']}")
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+
+# File layout: preamble, JSON header, then arrays at 64-byte aligned offsets
+BUNDLE_MAGIC = b'FRMODEL\x00'
+BUNDLE_VERSION = 1
+PREAMBLE = struct.Struct('<8sII32s')  # magic, version, header length, header sha256
+ALIGNMENT = 64
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def write_bundle(path, scorer_type, feature_names, scaler_mean, scaler_scale,
+                 params, arrays, metadata):
+    """
+    Write one self-describing model file
+
+    arrays are stored raw (little-endian) with a sha256 each, so readers can
+    memory-map them; everything else goes in the JSON header. The file is
+    written next to path and renamed into place, so processes that already
+    mapped the old bundle keep reading a consistent copy.
+    """
+    arrays = dict(arrays, scaler_mean=scaler_mean, scaler_scale=scaler_scale)
+    arrays = {
+        name: np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder('<'))
+        for name, array in arrays.items()
+    }
+
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': array.nbytes,
+            'sha256': hashlib.sha256(array.tobytes()).hexdigest()
+        }
+        offset = aligned(offset + array.nbytes)
+
+    header = {
+        'scorer_type': scorer_type,
+        'feature_names': list(feature_names),
+        'params': params,
+        'metadata': metadata,
+        'arrays': table
+    }
+    # Array offsets are relative to the first aligned byte after the header
+    header_bytes = json.dumps(header, default=float).encode()
+    data_start = aligned(PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_bytes),
+                              hashlib.sha256(header_bytes).digest()))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+class ModelBundle:
+    """
+    Read side of a model bundle
+
+    Opening reads and validates only the header. Arrays are views into one
+    shared read-only memory map, created (and checksummed) on first access,
+    so serving processes share the OS page cache instead of holding copies.
+    """
+
+    def __init__(self, path, header, data_start, verify=True):
+        self.path = path
+        self.header = header
+        self.data_start = data_start
+        self.verify = verify
+        self.buffer = None
+        self.arrays = {}
+
+    @classmethod
+    def open(cls, path, verify=True):
+        with open(path, 'rb') as f:
+            preamble = f.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise ValueError(f"{path} is not a model bundle")
+            magic, version, header_length, header_digest = PREAMBLE.unpack(preamble)
+            if magic != BUNDLE_MAGIC:
+                raise ValueError(f"{path} is not a model bundle")
+            if version != BUNDLE_VERSION:
+                raise ValueError(f"{path} has bundle format {version}, expected {BUNDLE_VERSION}")
+            header_bytes = f.read(header_length)
+
+        if hashlib.sha256(header_bytes).digest() != header_digest:
+            raise ValueError(f"{path} header is corrupt (checksum mismatch)")
+
+        bundle = cls(path, json.loads(header_bytes), aligned(PREAMBLE.size + header_length), verify)
+        bundle.validate()
+        return bundle
+
+    @property
+    def feature_names(self):
+        return self.header['feature_names']
+
+    @property
+    def metadata(self):
+        return self.header['metadata']
+
+    @property
+    def scorer_type(self):
+        return self.header['scorer_type']
+
+    @property
+    def params(self):
+        return self.header['params']
+
+    def validate(self):
+        """Reject bundles whose schema, metadata and array table disagree"""
+        n_features = len(self.feature_names)
+        # Unknown feature names raise here
+        FeatureEncoder(self.feature_names)
+        if len(set(self.feature_names)) != n_features:
+            raise ValueError("Bundle feature schema has duplicate names")
+
+        metadata = self.metadata
+        if metadata.get('n_features', n_features) != n_features:
+            raise ValueError(
+                f"Bundle metadata lists {metadata['n_features']} features, schema has {n_features}"
+            )
+        if metadata.get('feature_names', self.feature_names) != self.feature_names:
+            raise ValueError("Bundle metadata feature list differs from the schema")
+
+        table = self.header['arrays']
+        for name in ('scaler_mean', 'scaler_scale'):
+            if name not in table or table[name]['shape'] != [n_features]:
+                raise ValueError(f"Bundle {name} does not match the {n_features}-feature schema")
+
+        file_size = os.path.getsize(self.path)
+        for name, entry in table.items():
+            dtype = np.dtype(entry['dtype'])
+            if int(np.prod(entry['shape'])) * dtype.itemsize != entry['nbytes']:
+                raise ValueError(f"Bundle array '{name}' shape and size disagree")
+            if self.data_start + entry['offset'] + entry['nbytes'] > file_size:
+                raise ValueError(f"Bundle array '{name}' runs past the end of the file")
+
+    def array(self, name):
+        """Read-only memory-mapped view of one stored array"""
+        if name not in self.arrays:
+            entry = self.header['arrays'][name]
+            if self.buffer is None:
+                self.buffer = np.memmap(self.path, dtype=np.uint8, mode='r')
+
+            start = self.data_start + entry['offset']
+            view = self.buffer[start:start + entry['nbytes']]
+            if self.verify and hashlib.sha256(view).hexdigest() != entry['sha256']:
+                raise ValueError(f"Bundle array '{name}' is corrupt (checksum mismatch)")
+            self.arrays[name] = view.view(entry['dtype']).reshape(entry['shape'])
+        return self.arrays[name]
+
+    def has_array(self, name):
+        return name in self.header['arrays']
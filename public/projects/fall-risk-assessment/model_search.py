@@ -0,0 +1,193 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+# Hyperparameter grid searched for each model family in build_models()
+SEARCH_GRIDS = {
+    'Random Forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [5, 10, None],
+        'min_samples_split': [2, 10]
+    },
+    'Gradient Boosting': {
+        'n_estimators': [100, 200],
+        'max_depth': [3, 5],
+        'learning_rate': [0.05, 0.1]
+    },
+    'Histogram Gradient Boosting': {
+        'learning_rate': [0.05, 0.1],
+        'max_leaf_nodes': [15, 31, 63],
+        'l2_regularization': [0.0, 1.0]
+    },
+    'Logistic Regression': {
+        'C': [0.01, 0.1, 1.0, 10.0]
+    }
+}
+
+# Data shared with worker processes once instead of with every task
+WORKER_DATA = {}
+
+def init_worker(X, y, base_models):
+    WORKER_DATA['X'] = X
+    WORKER_DATA['y'] = y
+    WORKER_DATA['base_models'] = base_models
+    # Parallelism comes from the pool; threaded estimators get one core per worker
+    threadpool_limits(limits=1)
+
+def expand_grid(grids):
+    """List every (family, params) candidate in the grids"""
+    candidates = []
+    for family, grid in grids.items():
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[key] for key in keys)):
+            candidates.append((family, dict(zip(keys, values))))
+    return candidates
+
+def candidate_key(family, params):
+    return f"{family}|{json.dumps(params, sort_keys=True)}"
+
+# Estimator parameters that change speed but never the fitted model
+RUNTIME_PARAMS = ('n_jobs', 'verbose')
+
+def config_fingerprint(base_model, params):
+    """
+    Short hash of every hyperparameter a candidate is fitted with
+
+    Covers the base model's fixed values as well as the searched ones, so
+    editing build_models() never reuses fold results of the old settings.
+    """
+    config = clone(base_model).set_params(**params).get_params()
+    config = {name: value for name, value in config.items() if name not in RUNTIME_PARAMS}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def data_fingerprint(X, y):
+    """Short hash of the training data so cached folds never leak across datasets"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()[:16]
+
+def evaluate_fold(family, params, train_idx, val_idx):
+    """Fit one candidate on one (possibly subsampled) fold and return its validation AUC"""
+    X, y = WORKER_DATA['X'], WORKER_DATA['y']
+    model = clone(WORKER_DATA['base_models'][family]).set_params(**params)
+    model.fit(X[train_idx], y[train_idx])
+    return float(roc_auc_score(y[val_idx], model.predict_proba(X[val_idx])[:, 1]))
+
+def load_cache(path):
+    """Fold results from earlier (possibly interrupted) runs"""
+    cache = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    cache[entry['key']] = entry['auc']
+    return cache
+
+def successive_halving_search(X, y, base_models, grids=None, n_folds=5, eta=3,
+                              min_resources=100, seed=42, workers=None, cache_path=None):
+    """
+    Cross-validated hyperparameter search with successive halving
+
+    Every round scores all surviving candidates with k-fold CV on a growing
+    share of each training fold, then keeps the best 1/eta of them. The last
+    round uses the full folds. Each fold result is appended to cache_path as
+    soon as it finishes, so an interrupted search resumes where it stopped.
+    """
+
+    X = np.asarray(X)
+    y = np.asarray(y)
+    candidates = expand_grid(grids or SEARCH_GRIDS)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X, y))
+
+    # Subsample each training fold in a fixed random order
+    order_rng = np.random.default_rng(seed)
+    folds = [(order_rng.permutation(train_idx), val_idx) for train_idx, val_idx in folds]
+    fold_size = min(len(train_idx) for train_idx, _ in folds)
+
+    # One round per eta-fold growth in resources, without going below min_resources
+    n_rounds = max(1, min(
+        math.ceil(math.log(len(candidates), eta)),
+        1 + int(math.log(max(1, fold_size / min_resources), eta))
+    ))
+    resources = [
+        max(min(min_resources, fold_size), int(fold_size / eta ** (n_rounds - 1 - i)))
+        for i in range(n_rounds)
+    ]
+
+    fingerprint = data_fingerprint(X, y)
+    configs = {candidate_key(family, params): config_fingerprint(base_models[family], params)
+               for family, params in candidates}
+
+    def fold_key(family, params, n_resources, fold_index):
+        key = candidate_key(family, params)
+        return f"{fingerprint}|{key}|{configs[key]}|{n_resources}|seed={seed}|{n_folds}:{fold_index}"
+
+    cache = load_cache(cache_path)
+    rounds = []
+    scores = {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(X, y, base_models)) as pool:
+        for round_index, n_resources in enumerate(resources):
+            # Submit every fold that isn't already cached
+            pending = {}
+            for family, params in candidates:
+                for fold_index, (train_idx, val_idx) in enumerate(folds):
+                    key = fold_key(family, params, n_resources, fold_index)
+                    if key not in cache:
+                        future = pool.submit(evaluate_fold, family, params, train_idx[:n_resources], val_idx)
+                        pending[future] = key
+
+            # Record each fold as soon as it finishes, whatever order they finish in
+            for future in as_completed(pending):
+                key = pending[future]
+                cache[key] = future.result()
+                if cache_path:
+                    with open(cache_path, 'a') as f:
+                        f.write(json.dumps({'key': key, 'auc': cache[key]}) + '\n')
+
+            scores = {}
+            for family, params in candidates:
+                scores[candidate_key(family, params)] = [
+                    cache[fold_key(family, params, n_resources, fold_index)]
+                    for fold_index in range(n_folds)
+                ]
+
+            ranked = sorted(candidates, key=lambda c: np.mean(scores[candidate_key(*c)]), reverse=True)
+            rounds.append({
+                'round': round_index,
+                'resources': n_resources,
+                'n_candidates': len(candidates),
+                'best_cv_auc': float(np.mean(scores[candidate_key(*ranked[0])]))
+            })
+
+            if round_index < n_rounds - 1:
+                candidates = ranked[:max(1, math.ceil(len(candidates) / eta))]
+            else:
+                candidates = ranked
+
+    best_family, best_params = candidates[0]
+    best_scores = scores[candidate_key(best_family, best_params)]
+
+    return {
+        'best_family': best_family,
+        'best_params': best_params,
+        'cv_folds': n_folds,
+        'cv_auc_scores': best_scores,
+        'cv_auc_mean': float(np.mean(best_scores)),
+        'cv_auc_std': float(np.std(best_scores)),
+        'n_candidates': len(expand_grid(grids or SEARCH_GRIDS)),
+        'rounds': rounds
+    }
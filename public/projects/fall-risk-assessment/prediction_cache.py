@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Decimal places kept of each encoded feature; the form's finest step is 0.1
+KEY_DECIMALS = 4
+
+class PredictionCache:
+    """
+    Bounded, thread-safe LRU of predictions keyed on (model version, encoded features)
+
+    Feature vectors are rounded to KEY_DECIMALS before hashing, so float
+    noise from the form never splits one patient profile over two entries.
+    The lock only guards the table: a miss is computed outside it, so
+    sessions never wait on each other's model calls (two sessions missing
+    on the same key at once both compute it, with the same result).
+    """
+
+    def __init__(self, max_entries=10_000, decimals=KEY_DECIMALS):
+        self.max_entries = max_entries
+        self.decimals = decimals
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, model_version, x):
+        # + 0.0 folds -0.0 into 0.0, which would otherwise hash differently
+        quantized = np.round(np.asarray(x, dtype=np.float64), self.decimals) + 0.0
+        return model_version, quantized.shape, quantized.tobytes()
+
+    def get_or_compute(self, model_version, x, compute):
+        """Cached prediction for x, or compute() stored as the newest entry"""
+        key = self.key(model_version, x)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
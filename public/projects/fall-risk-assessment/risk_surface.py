@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from thresholds import BAND_LABELS
+
+# The simulator's sliders: feature -> every value the slider can take
+SIM_AXES = {
+    'age': np.arange(65, 96),
+    'gait_speed': np.linspace(0.0, 10.0, 21),
+    'balance_score': np.linspace(0.0, 10.0, 21),
+    'previous_falls': np.arange(0, 11),
+    'num_medications': np.arange(0, 16),
+    'activity_level': np.linspace(0.0, 10.0, 21)
+}
+
+# Everything else about the simulated patient is held fixed
+SIM_BASELINE = {
+    'bmi': 27.0,
+    'muscle_strength': 5.0,
+    'takes_sedatives': 0,
+    'takes_blood_pressure_meds': 0,
+    'has_arthritis': 0,
+    'has_osteoporosis': 0,
+    'has_parkinsons': 0,
+    'has_diabetes': 0,
+    'vision_impairment': 0,
+    'cognitive_score': 7.0,
+    'uses_walking_aid': 0,
+    'lives_alone': 0,
+    'home_hazards': 2,
+    'gender_male': 1
+}
+
+SURFACE_DTYPE = np.float16
+
+# Grid points scored per model call (bounds the scorer's temporaries)
+CHUNK_ROWS = 2 ** 18
+
+# Scorers that score the whole grid in seconds (~8 s for the logistic model).
+# Tree ensembles take minutes to tens of minutes (~20 min for the 200-tree
+# forest), so their surface is only built on request and until then the
+# simulator scores its grid points on demand.
+PRECOMPUTED_SCORERS = ('linear',)
+
+def grid_index(axes, inputs):
+    """Grid index of a slider position (each value snapped to its nearest grid point)"""
+    return tuple(int(np.abs(values - inputs[name]).argmin()) for name, values in axes.items())
+
+def surface_key(model_version, axes=SIM_AXES, baseline=SIM_BASELINE):
+    """Cache key: the model plus the grid and fixed inputs it was scored on"""
+    config = {
+        'model': model_version,
+        'axes': {name: values.tolist() for name, values in axes.items()},
+        'baseline': baseline,
+        'dtype': np.dtype(SURFACE_DTYPE).name
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+class RiskSurface:
+    """
+    Calibrated fall probability at every point of the simulator's grid
+
+    The grid is scored once per model, in row chunks of one slab of the
+    first axis at a time, and kept as a float16 array (about 100 MB, memory-mapped when
+    loaded from disk). A slider position is then an index lookup and any
+    two-input slice is a ready-made heatmap. Band cut-offs are rounded to
+    the same precision as the stored probabilities, so a stored value
+    sitting exactly on a cut-off keeps the band it had before rounding.
+    """
+
+    def __init__(self, values, cutoffs, axes=SIM_AXES):
+        self.values = values
+        self.axes = dict(axes)
+        self.cutoffs = {family: np.asarray(c, dtype=np.float64).astype(values.dtype)
+                        for family, c in cutoffs.items()}
+
+    @classmethod
+    def build(cls, scorer, encoder, bands, axes=SIM_AXES, baseline=SIM_BASELINE):
+        names = list(axes)
+        shape = tuple(len(axes[name]) for name in names)
+        values = np.empty(shape, dtype=SURFACE_DTYPE)
+        slabs = values.reshape(shape[0], -1)
+
+        # All combinations of the remaining axes, shared by every slab
+        rest = np.meshgrid(*(axes[name] for name in names[1:]), indexing='ij')
+        rest = {name: grid.ravel() for name, grid in zip(names[1:], rest)}
+        n_rows = len(next(iter(rest.values())))
+
+        # Encoded once (as the app encodes a single patient); slabs differ only in the first column
+        data = {name: np.broadcast_to(value, n_rows) for name, value in baseline.items()}
+        data[names[0]] = np.broadcast_to(axes[names[0]][0], n_rows)
+        data.update(rest)
+        X = encoder.encode(data)
+        first_column = encoder.feature_names.index(names[0])
+
+        for i, first in enumerate(axes[names[0]]):
+            X[:, first_column] = first
+            for start in range(0, n_rows, CHUNK_ROWS):
+                rows = slice(start, start + CHUNK_ROWS)
+                slabs[i, rows] = bands.calibrate(scorer.predict_risk(X[rows]))
+
+        return cls(values, bands.cutoffs, axes)
+
+    @classmethod
+    def load_or_build(cls, cache_dir, model_version, scorer, encoder, bands,
+                      axes=SIM_AXES, baseline=SIM_BASELINE):
+        """
+        Memory-map the cached surface for this model, scoring and saving it first if needed
+
+        Surfaces of earlier model versions are removed when a new one is saved.
+        """
+        path = cls.cache_path(cache_dir, model_version, axes, baseline)
+        file_name = os.path.basename(path)
+        if not os.path.exists(path):
+            surface = cls.build(scorer, encoder, bands, axes, baseline)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, surface.values)
+            os.replace(tmp_path, path)
+            for stale in os.listdir(cache_dir):
+                if stale.endswith('.npy') and stale != file_name:
+                    os.remove(os.path.join(cache_dir, stale))
+        return cls(np.load(path, mmap_mode='r'), bands.cutoffs, axes)
+
+    @classmethod
+    def cache_path(cls, cache_dir, model_version, axes=SIM_AXES, baseline=SIM_BASELINE):
+        return os.path.join(cache_dir, f"{surface_key(model_version, axes, baseline)}.npy")
+
+    def index(self, **inputs):
+        """Grid index of a slider position (each value snapped to its nearest grid point)"""
+        return grid_index(self.axes, inputs)
+
+    def probability(self, **inputs):
+        return float(self.values[self.index(**inputs)])
+
+    def label(self, family, probability):
+        band = np.searchsorted(self.cutoffs[family], self.values.dtype.type(probability), side='right')
+        return BAND_LABELS[family][int(band)]
+
+    def slice(self, x, y, **inputs):
+        """(y values, x values, probabilities) with every other input held at the given position"""
+        position = list(self.index(**inputs))
+        names = list(self.axes)
+        for name in (x, y):
+            position[names.index(name)] = slice(None)
+        grid = np.asarray(self.values[tuple(position)], dtype=np.float32)
+        if names.index(x) < names.index(y):
+            grid = grid.T
+        return self.axes[y], self.axes[x], grid
+
+class OnDemandSurface:
+    """
+    The RiskSurface lookups, scored when asked for
+
+    Slider positions snap to the same grid points, so results match a
+    built surface (to its float16 rounding). A point is one model call and
+    a heatmap slice at most 31 x 21 rows, cheap even for tree ensembles.
+    """
+
+    def __init__(self, scorer, encoder, bands, axes=SIM_AXES, baseline=SIM_BASELINE):
+        self.scorer = scorer
+        self.encoder = encoder
+        self.bands = bands
+        self.axes = dict(axes)
+        self.baseline = baseline
+
+    def score(self, data):
+        return np.atleast_1d(self.bands.calibrate(self.scorer.predict_risk(self.encoder.encode(data))))
+
+    def snapped(self, **inputs):
+        return {name: values[i] for (name, values), i in zip(self.axes.items(), grid_index(self.axes, inputs))}
+
+    def probability(self, **inputs):
+        return float(self.score(dict(self.baseline, **self.snapped(**inputs)))[0])
+
+    def label(self, family, probability):
+        return self.bands.label(family, probability)
+
+    def slice(self, x, y, **inputs):
+        """(y values, x values, probabilities) with every other input held at the given position"""
+        grid_y, grid_x = np.meshgrid(self.axes[y], self.axes[x], indexing='ij')
+        n_rows = grid_x.size
+        data = {name: np.broadcast_to(value, n_rows)
+                for name, value in dict(self.baseline, **self.snapped(**inputs)).items()}
+        data.update({x: grid_x.ravel(), y: grid_y.ravel()})
+        return self.axes[y], self.axes[x], self.score(data).reshape(grid_x.shape).astype(np.float32)
+
+def load_surface(cache_dir, model_version, scorer, encoder, bands, build=None):
+    """
+    The simulator's surface for this model: precomputed when it is cached on
+    disk or cheap to build (or build=True), otherwise scored on demand
+    """
+    if build is None:
+        build = (getattr(scorer, 'bundle_type', None) in PRECOMPUTED_SCORERS
+                 or os.path.exists(RiskSurface.cache_path(cache_dir, model_version)))
+    if build:
+        return RiskSurface.load_or_build(cache_dir, model_version, scorer, encoder, bands)
+    return OnDemandSurface(scorer, encoder, bands)
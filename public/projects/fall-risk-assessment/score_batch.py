@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import (DEFAULT_CHUNK_ROWS, PASSTHROUGH_COLUMNS, band_counts, count_rows,
+                           iter_chunks, required_columns, score_chunk, scored_csv)
+from fast_scorer import load_serving_model, model_version
+from feature_encoder import FeatureEncoder
+from thresholds import BAND_LABELS, RiskBands
+
+# Model, encoder and bands, loaded once per worker process
+WORKER_DATA = {}
+
+def load_model(models_dir):
+    scorer, metadata = load_serving_model(models_dir)
+    return scorer, metadata, FeatureEncoder(scorer.feature_names), RiskBands.from_metadata(metadata)
+
+def init_worker(models_dir):
+    scorer, _, encoder, bands = load_model(models_dir)
+    WORKER_DATA.update(scorer=scorer, encoder=encoder, bands=bands)
+
+def score_task(chunk, header):
+    """CSV bytes of one scored chunk plus its row, invalid-row and band counts"""
+    scored, valid = score_chunk(chunk, WORKER_DATA['scorer'], WORKER_DATA['encoder'], WORKER_DATA['bands'])
+    return {
+        'data': scored_csv(scored, header).encode(),
+        'n_rows': len(scored),
+        'n_invalid': int((~valid).sum()),
+        'risk_bands': band_counts(scored, valid, WORKER_DATA['bands'])
+    }
+
+def input_fingerprint(path):
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def write_checkpoint(path, state):
+    """Replace the checkpoint atomically, so a crash leaves the old or the new one"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path, input_info, model_key):
+    """Saved progress for this input and model, or None to start from scratch"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state['input'] != input_info or state['model'] != model_key:
+        raise SystemExit(f"{path} belongs to a different input file or model; rerun with --restart")
+    return state
+
+def verify_sample(input_path, output_path, scorer, encoder, bands, n_rows):
+    """
+    Rescore the first n_rows patients one at a time, as the app does
+
+    Returns the largest probability difference to the written file and
+    whether every risk band and urgency agrees.
+    """
+    source = next(iter_chunks(input_path, input_path, required_columns(encoder), chunksize=n_rows))
+    written = pd.read_csv(output_path, nrows=len(source))
+    records = source.drop(columns=[c for c in PASSTHROUGH_COLUMNS if c in source.columns]).to_dict('records')
+
+    max_diff = 0.0
+    agree = True
+    for record, (_, row) in zip(records, written.iterrows()):
+        try:
+            probability = bands.calibrate(scorer.predict_risk(encoder.encode(record)[0]))
+        except (ValueError, TypeError):
+            continue
+        if not np.isfinite(probability) or pd.isna(row['probability']):
+            continue
+        max_diff = max(max_diff, abs(probability - row['probability']))
+        agree &= (row['risk_band'] == bands.label('risk', probability)
+                  and row['urgency'] == bands.label('urgency', probability))
+    return max_diff, agree
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a patient file on all cores, chunk by chunk, with resumable checkpoints")
+    parser.add_argument('input', help="CSV or Parquet file in the training schema")
+    parser.add_argument('--output', default=None,
+                        help="Scored CSV (default: <input>_scored.csv)")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Scoring processes (default: all cores)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore any checkpoint and score from the first row")
+    parser.add_argument('--verify-rows', type=int, default=1000,
+                        help="Patients rescored one at a time (the app's path) to check the output; 0 to skip")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_path = args.output or os.path.splitext(args.input)[0] + '_scored.csv'
+    checkpoint_path = output_path + '.checkpoint'
+    workers = args.workers or os.cpu_count() or 1
+
+    print("🏥 Fall Risk Assessment - Batch Scoring")
+    print("=" * 60)
+
+    scorer, metadata, encoder, bands = load_model(args.models_dir)
+    input_info = input_fingerprint(args.input)
+    model_key = model_version(scorer, metadata)
+
+    state = None if args.restart else load_checkpoint(checkpoint_path, input_info, model_key)
+    if state is not None and state['complete']:
+        print(f"✅ {output_path} is already complete ({state['rows_done']:,} rows); use --restart to rescore")
+        raise SystemExit(0)
+    if state is None:
+        state = {
+            'input': input_info,
+            'model': model_key,
+            'model_type': metadata.get('model_type'),
+            'rows_done': 0,
+            'output_bytes': 0,
+            'n_invalid': 0,
+            'risk_bands': [0] * len(BAND_LABELS['risk']),
+            'seconds': 0.0,
+            'complete': False
+        }
+        open(output_path, 'wb').close()
+    else:
+        print(f"♻️  Resuming after {state['rows_done']:,} rows")
+        if os.path.getsize(output_path) < state['output_bytes']:
+            raise SystemExit(f"{output_path} is shorter than its checkpoint; rerun with --restart")
+
+    total_rows = count_rows(args.input, args.input)
+    print(f"📂 {args.input} → {output_path}")
+    print(f"🤖 {metadata.get('model_type')} on {workers} worker(s), {args.chunk_rows:,} rows per chunk")
+
+    start = time.perf_counter()
+    resumed_rows = state['rows_done']
+    resumed_seconds = state['seconds']
+
+    def write_result(out, result):
+        """Append one scored chunk, make it durable, then move the checkpoint past it"""
+        out.write(result['data'])
+        out.flush()
+        os.fsync(out.fileno())
+
+        elapsed = time.perf_counter() - start
+        state['rows_done'] += result['n_rows']
+        state['output_bytes'] += len(result['data'])
+        state['n_invalid'] += result['n_invalid']
+        state['risk_bands'] = (np.asarray(state['risk_bands']) + result['risk_bands']).tolist()
+        state['seconds'] = resumed_seconds + elapsed
+        write_checkpoint(checkpoint_path, state)
+
+        done = f"{state['rows_done']:,}" + (f" / {total_rows:,}" if total_rows else "")
+        print(f"   {done} rows  ({(state['rows_done'] - resumed_rows) / elapsed:,.0f} rows/s)")
+
+    chunks = iter_chunks(args.input, args.input, required_columns(encoder), args.chunk_rows,
+                         skip_rows=state['rows_done'])
+    header = state['rows_done'] == 0
+
+    with open(output_path, 'r+b') as out:
+        # Drop anything written after the last checkpoint
+        out.truncate(state['output_bytes'])
+        out.seek(state['output_bytes'])
+
+        if workers == 1:
+            init_worker(args.models_dir)
+            for chunk in chunks:
+                write_result(out, score_task(chunk, header))
+                header = False
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(args.models_dir,)) as pool:
+                # A bounded window of chunks in flight; results are written in input order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(score_task, chunk, header))
+                    header = False
+                    if len(pending) >= 2 * workers:
+                        write_result(out, pending.popleft().result())
+                while pending:
+                    write_result(out, pending.popleft().result())
+
+    state['complete'] = True
+    write_checkpoint(checkpoint_path, state)
+
+    elapsed = time.perf_counter() - start
+    rows_this_run = state['rows_done'] - resumed_rows
+    print(f"\n✅ Scored {rows_this_run:,} rows in {elapsed:.1f}s ({rows_this_run / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"   Invalid rows: {state['n_invalid']:,}")
+    for label, count in zip(BAND_LABELS['risk'], state['risk_bands']):
+        print(f"   {label}: {count:,}")
+
+    if args.verify_rows:
+        max_diff, agree = verify_sample(args.input, output_path, scorer, encoder, bands, args.verify_rows)
+        status = '✓' if agree and max_diff <= 1e-6 else '✗'
+        print(f"\n🔁 First {args.verify_rows:,} patients vs the app's single-patient path: "
+              f"max |Δp| {max_diff:.1e}, bands {'match' if agree else 'differ'} {status}")
@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from batch_scoring import GENDERS, in_range, required_columns
+from fast_scorer import load_serving_model
+from feature_encoder import FeatureEncoder
+from thresholds import BAND_LABELS, RiskBands
+
+# Latencies / batch sizes kept for the percentiles in /stats
+LATENCY_WINDOW = 100_000
+
+# Largest request head and body accepted
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 ** 2
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def validate_record(record, columns):
+    """Raise a RequestError naming every missing or malformed field of one patient record"""
+    if not isinstance(record, dict):
+        raise RequestError(400, "Each patient must be a JSON object")
+    problems = []
+    for col in columns:
+        value = record.get(col)
+        if col == 'gender':
+            ok = value in GENDERS
+        else:
+            ok = (isinstance(value, (int, float)) and not isinstance(value, bool)
+                  and bool(in_range(col, value)))
+        if not ok:
+            problems.append(col)
+    if problems:
+        raise RequestError(400, f"Missing or invalid fields: {problems}")
+
+class ServiceStats:
+    """Rolling request latencies and batch sizes"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_batches = 0
+        self.started = time.time()
+
+    def record_request(self, seconds, ok=True):
+        self.n_requests += 1
+        self.n_errors += not ok
+        self.latencies.append(seconds)
+
+    def record_batch(self, size):
+        self.n_batches += 1
+        self.batch_sizes.append(size)
+
+    def summary(self):
+        latencies = np.asarray(self.latencies) * 1000
+        sizes = np.asarray(self.batch_sizes)
+        percentiles = np.percentile(latencies, [50, 90, 99]) if len(latencies) else [None] * 3
+        return {
+            'requests': self.n_requests,
+            'errors': self.n_errors,
+            'batches': self.n_batches,
+            'uptime_s': time.time() - self.started,
+            'latency_ms': dict(zip(['p50', 'p90', 'p99'],
+                                   [None if p is None else float(p) for p in percentiles])),
+            'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+            'max_batch_size': int(sizes.max()) if len(sizes) else None
+        }
+
+class MicroBatcher:
+    """
+    Collects concurrent single-patient requests into one matrix call
+
+    The first queued request opens a batch; everything that arrives within
+    max_wait seconds (up to max_batch rows) joins it. Scoring runs on a
+    worker thread, so new requests keep queueing for the next batch while
+    one is being scored.
+    """
+
+    def __init__(self, scorer, bands, stats, max_batch=256, max_wait=0.002):
+        self.scorer = scorer
+        self.bands = bands
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+
+    async def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    def drain(self, batch):
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    def score(self, X):
+        return np.atleast_1d(self.bands.calibrate(np.asarray(self.scorer.predict_risk(X), dtype=np.float64)))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            self.drain(batch)
+            if len(batch) < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                self.drain(batch)
+
+            X = np.vstack([row for row, _ in batch])
+            try:
+                probabilities = await loop.run_in_executor(None, self.score, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.record_batch(len(batch))
+
+            risk = self.bands.band('risk', probabilities)
+            urgency = self.bands.band('urgency', probabilities)
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result({
+                        'probability': float(probabilities[i]),
+                        'risk_band': BAND_LABELS['risk'][risk[i]],
+                        'urgency': BAND_LABELS['urgency'][urgency[i]]
+                    })
+
+class ScoringService:
+    """Minimal HTTP/1.1 (keep-alive) JSON scoring server on asyncio streams"""
+
+    def __init__(self, models_dir='models', max_batch=256, max_wait=0.002):
+        self.scorer, self.metadata = load_serving_model(models_dir)
+        self.encoder = FeatureEncoder(self.scorer.feature_names)
+        self.columns = required_columns(self.encoder)
+        self.stats = ServiceStats()
+        self.batcher = MicroBatcher(self.scorer, RiskBands.from_metadata(self.metadata), self.stats,
+                                    max_batch=max_batch, max_wait=max_wait)
+
+    async def score(self, body):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise RequestError(400, "Body is not valid JSON")
+
+        records = payload if isinstance(payload, list) else [payload]
+        for record in records:
+            validate_record(record, self.columns)
+        # Same encoding (and dtype) as the app, so scores match it exactly
+        rows = [self.encoder.encode(record) for record in records]
+        results = await asyncio.gather(*(self.batcher.submit(row) for row in rows))
+        return results if isinstance(payload, list) else results[0]
+
+    async def route(self, method, path, body):
+        if path == '/score':
+            if method != 'POST':
+                raise RequestError(405, "Use POST")
+            return await self.score(body)
+        if path == '/stats' and method == 'GET':
+            return self.stats.summary()
+        if path == '/health' and method == 'GET':
+            return {'status': 'ok', 'model_type': self.metadata.get('model_type')}
+        raise RequestError(404, f"No route for {method} {path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 413, {'error': "Request head too large"}, keep_alive=False)
+                    break
+                start = time.perf_counter()
+
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                method, path, version = (request_line.split(' ') + ['', ''])[:3]
+                headers = {}
+                for line in header_lines:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                # Without a valid length the body can't be framed, so the connection closes
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, 400, {'error': f"Invalid Content-Length: {length!r}"},
+                                       keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': "Body too large"}, keep_alive=False)
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    status, payload = 200, await self.route(method, path.split('?')[0], body)
+                except RequestError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                await self.respond(writer, status, payload, keep_alive)
+                if path.startswith('/score'):
+                    self.stats.record_request(time.perf_counter() - start, ok=status == 200)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        batch_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        print(f"🩺 Scoring {self.metadata.get('model_type')} on http://{host}:{port} "
+              f"(batches of ≤{self.batcher.max_batch}, {self.batcher.max_wait * 1000:g} ms window)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP fall risk scoring service with request micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--max-batch', type=int, default=256,
+                        help="Most requests scored in one matrix call")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help="How long a batch stays open for more requests (0 = only what is already queued)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    service = ScoringService(args.models_dir, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
@@ -0,0 +1,191 @@
+import numpy as np
+
+# Cut-offs the app used before bands were fitted (and still uses without them)
+DEFAULT_CUTOFFS = {
+    'risk': [0.3, 0.6],
+    'urgency': [0.4, 0.7]
+}
+
+BAND_LABELS = {
+    'risk': ['Low', 'Medium', 'High'],
+    'urgency': ['Routine', 'Soon', 'Immediate']
+}
+
+# Each cut-off is the threshold that meets one operating target:
+# (sensitivity, s) = highest threshold catching at least s of fallers above it
+# (specificity, s) = lowest threshold keeping at least s of non-fallers below it
+BAND_TARGETS = {
+    'risk': [('sensitivity', 0.90), ('specificity', 0.80)],
+    'urgency': [('sensitivity', 0.80), ('specificity', 0.90)]
+}
+
+def threshold_sweep(y_true, y_score, sample_weight=None):
+    """
+    Sensitivity and specificity at every distinct score, from one sort
+
+    Returns (thresholds, sensitivity, specificity) with thresholds in
+    decreasing order; entry i describes predicting positive when
+    score >= thresholds[i]. sample_weight lets a binned histogram stand in
+    for the raw predictions.
+    """
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score, dtype=np.float64)
+    weight = np.ones(len(y_score)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+
+    order = np.argsort(y_score, kind='mergesort')[::-1]
+    y_score = y_score[order]
+    positive = (y_true[order] == 1) * weight[order]
+    negative = (y_true[order] != 1) * weight[order]
+
+    # Last index of each run of equal scores
+    distinct = np.r_[np.flatnonzero(np.diff(y_score)), len(y_score) - 1]
+    tp = np.cumsum(positive)[distinct]
+    fp = np.cumsum(negative)[distinct]
+
+    sensitivity = tp / tp[-1] if tp[-1] > 0 else np.zeros_like(tp)
+    specificity = 1 - fp / fp[-1] if fp[-1] > 0 else np.ones_like(fp)
+    return y_score[distinct], sensitivity, specificity
+
+def cutoff_for_target(sweep, metric, target):
+    """Threshold meeting one target, with the operating point it achieves"""
+    thresholds, sensitivity, specificity = sweep
+    if metric == 'sensitivity':
+        # Sensitivity only grows as the threshold drops
+        i = min(np.searchsorted(sensitivity, target), len(thresholds) - 1)
+    elif metric == 'specificity':
+        # Specificity only falls as the threshold drops
+        i = max(np.searchsorted(-specificity, -target, side='right') - 1, 0)
+    else:
+        raise ValueError(f"Unknown target metric '{metric}'")
+
+    return {
+        'threshold': float(thresholds[i]),
+        'target': f"{metric} >= {target}",
+        'sensitivity': float(sensitivity[i]),
+        'specificity': float(specificity[i]),
+        'met': bool((sensitivity if metric == 'sensitivity' else specificity)[i] >= target)
+    }
+
+def resolve_band_targets(targets=None):
+    """
+    Targets for every band family, with custom ones checked against BAND_LABELS
+
+    targets maps family -> [(metric, target), ...]; families it leaves out
+    keep their BAND_TARGETS. Every scorer looks up labels by family, so a
+    family without labels, or with a target count that does not match
+    them, is rejected.
+    """
+    resolved = dict(BAND_TARGETS)
+    for family, family_targets in (targets or {}).items():
+        if family not in BAND_LABELS:
+            raise ValueError(f"Unknown band family '{family}' (expected one of {sorted(BAND_LABELS)})")
+        family_targets = [tuple(target) for target in family_targets]
+        if len(family_targets) != len(BAND_LABELS[family]) - 1:
+            raise ValueError(f"Band family '{family}' needs {len(BAND_LABELS[family]) - 1} targets "
+                             f"(one per cut-off between {BAND_LABELS[family]}), got {len(family_targets)}")
+        resolved[family] = family_targets
+    return resolved
+
+def choose_bands(y_true, y_score, targets=None, sample_weight=None):
+    """Cut-offs (increasing) for every band family, from BAND_TARGETS overridden by targets"""
+    sweep = threshold_sweep(y_true, y_score, sample_weight)
+    bands = {}
+    for family, family_targets in resolve_band_targets(targets).items():
+        points = [cutoff_for_target(sweep, metric, target) for metric, target in family_targets]
+        # A band can be empty but never inverted
+        cutoffs = np.maximum.accumulate([point['threshold'] for point in points]).tolist()
+        bands[family] = {
+            'cutoffs': cutoffs,
+            'labels': BAND_LABELS[family],
+            'operating_points': points
+        }
+    return bands
+
+# Calibrated probabilities never leave this range: no patient is scored as certain to fall or not
+CALIBRATION_BOUNDS = (0.01, 0.99)
+
+# Raw probabilities are clipped this far from 0 and 1 before taking the logit
+LOGIT_EPS = 1e-6
+
+def logit(y_prob):
+    p = np.clip(np.asarray(y_prob, dtype=np.float64), LOGIT_EPS, 1 - LOGIT_EPS)
+    return np.log(p / (1 - p))
+
+def fit_calibration(y_true, y_prob, sample_weight=None, bounds=CALIBRATION_BOUNDS):
+    """
+    Platt calibration: a logistic fit on the logit of the raw probability
+
+    Two parameters, so it does not overfit a few hundred predictions the
+    way a step function does, and it is strictly increasing, so rankings
+    (and AUC) are unchanged. Its output is clipped to bounds. Fit it on
+    predictions the model was not trained on (out-of-fold), never on the
+    test set the reported metrics come from.
+    """
+    from sklearn.linear_model import LogisticRegression
+    platt = LogisticRegression(C=1e6)
+    platt.fit(logit(y_prob).reshape(-1, 1), np.asarray(y_true), sample_weight=sample_weight)
+    return {
+        'method': 'platt',
+        'slope': float(platt.coef_[0, 0]),
+        'intercept': float(platt.intercept_[0]),
+        'bounds': list(bounds)
+    }
+
+def apply_calibration(calibration, y_prob):
+    if calibration['method'] != 'platt':
+        raise ValueError(f"Unknown calibration method '{calibration['method']}'")
+    z = calibration['slope'] * logit(y_prob) + calibration['intercept']
+    return np.clip(1 / (1 + np.exp(-z)), *calibration['bounds'])
+
+def evaluate_bands(bands, y_true, y_score, sample_weight=None):
+    """Sensitivity and specificity at every fitted cut-off on other data (e.g. the test set)"""
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score, dtype=np.float64)
+    weight = np.ones(len(y_score)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    positive = (y_true == 1) * weight
+    negative = (y_true != 1) * weight
+    results = {}
+    for family, band in bands.items():
+        results[family] = []
+        for cutoff in band['cutoffs']:
+            above = y_score >= cutoff
+            results[family].append({
+                'threshold': cutoff,
+                'sensitivity': float(positive[above].sum() / positive.sum()) if positive.sum() > 0 else 0.0,
+                'specificity': float(negative[~above].sum() / negative.sum()) if negative.sum() > 0 else 1.0
+            })
+    return results
+
+class RiskBands:
+    """
+    Calibration map and band cut-offs from the model metadata
+
+    Calibration is a closed-form map and band lookups are binary searches
+    over the cut-offs, so one patient or a whole array costs O(log n) per
+    value. Metadata written before bands were fitted falls back to the old
+    hard-coded cut-offs and no calibration.
+    """
+
+    def __init__(self, cutoffs=None, calibration=None):
+        self.cutoffs = {family: np.asarray(values, dtype=np.float64)
+                        for family, values in (cutoffs or DEFAULT_CUTOFFS).items()}
+        self.calibration = calibration
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        bands = metadata.get('risk_bands')
+        cutoffs = {family: band['cutoffs'] for family, band in bands.items()} if bands else None
+        return cls(cutoffs, metadata.get('calibration'))
+
+    def calibrate(self, y_prob):
+        if self.calibration is None:
+            return y_prob
+        calibrated = apply_calibration(self.calibration, y_prob)
+        return float(calibrated) if np.ndim(calibrated) == 0 else calibrated
+
+    def band(self, family, y_prob):
+        """Band index (0 = lowest) of an already calibrated probability"""
+        return np.searchsorted(self.cutoffs[family], y_prob, side='right')
+
+    def label(self, family, y_prob):
+        return BAND_LABELS[family][int(self.band(family, y_prob))]
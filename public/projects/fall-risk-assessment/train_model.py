@@ -7,26 +7,18 @@ from sklearn.metrics import classification_report, confusion_matrix, roc_auc_sco
 import joblib
 import json
 
+from dataset_io import load_dataset
+from fast_scorer import export_bundle, export_scorer
+from feature_encoder import DEFAULT_FEATURES, FeatureEncoder
+
 def prepare_features(df):
     """Prepare features for modeling"""
     
-    feature_cols = [
-        'age', 'bmi', 'gait_speed', 'balance_score', 'muscle_strength',
-        'previous_falls', 'num_medications', 'takes_sedatives',
-        'takes_blood_pressure_meds', 'has_arthritis', 'has_osteoporosis',
-        'has_parkinsons', 'has_diabetes', 'vision_impairment',
-        'cognitive_score', 'uses_walking_aid', 'lives_alone',
-        'home_hazards', 'activity_level'
-    ]
-    
-    X = df[feature_cols]
+    # Column order and gender encoding come from the shared feature schema
+    encoder = FeatureEncoder(DEFAULT_FEATURES)
+    X = encoder.encode(df, dtype=np.float64)
     
-    # One-hot encode gender if needed
-    if 'gender' in df.columns:
-        gender_dummies = pd.get_dummies(df['gender'], prefix='gender')
-        X = pd.concat([X, gender_dummies], axis=1)
-    
-    return X, feature_cols
+    return X, encoder.feature_names
 
 def train_models(X_train, y_train, X_test, y_test):
     """Train multiple models and compare"""
@@ -69,12 +61,12 @@ if __name__ == "__main__":
     
     # Load data
     print("\n📂 Loading data...")
-    train_df = pd.read_csv('data/fall_risk_train.csv')
-    test_df = pd.read_csv('data/fall_risk_test.csv')
+    train_df = load_dataset('data/fall_risk_train.csv')
+    test_df = load_dataset('data/fall_risk_test.csv')
     
     # Prepare features
     print("🔧 Preparing features...")
-    X_train, feature_cols = prepare_features(train_df)
+    X_train, feature_names = prepare_features(train_df)
     X_test, _ = prepare_features(test_df)
     
     y_train = train_df['actual_fall_6months']
@@ -103,7 +95,7 @@ if __name__ == "__main__":
     # Feature importance (for tree-based models)
     if hasattr(best_model, 'feature_importances_'):
         feature_importance = pd.DataFrame({
-            'feature': X_train.columns,
+            'feature': feature_names,
             'importance': best_model.feature_importances_
         }).sort_values('importance', ascending=False)
         
@@ -114,20 +106,28 @@ if __name__ == "__main__":
     print(f"\n💾 Saving model and scaler...")
     joblib.dump(best_model, 'models/fall_risk_model.pkl')
     joblib.dump(scaler, 'models/scaler.pkl')
+    scorer_file = export_scorer(best_model, scaler, feature_names)
     
     # Save feature names
     with open('models/feature_names.json', 'w') as f:
-        json.dump(list(X_train.columns), f)
+        json.dump(feature_names, f)
     
     # Save model metadata
     metadata = {
         'model_type': best_model_name,
         'accuracy': float(results[best_model_name]['accuracy']),
         'auc': float(results[best_model_name]['auc']),
-        'n_features': len(X_train.columns),
+        'n_features': len(feature_names),
         'training_samples': len(X_train),
-        'feature_names': list(X_train.columns)
+        'feature_names': feature_names
     }
+    if scorer_file is not None:
+        metadata['scorer_file'] = scorer_file
+    
+    # Rewritten (or removed) every run: load_serving_model() prefers the bundle to the pickles
+    bundle_file = export_bundle(best_model, scaler, feature_names, metadata)
+    if bundle_file is not None:
+        metadata['bundle_file'] = bundle_file
     
     with open('models/metadata.json', 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -138,3 +138,7 @@ if __name__ == "__main__":
     print("   - models/scaler.pkl")
     print("   - models/feature_names.json")
     print("   - models/metadata.json")
+    if scorer_file is not None:
+        print(f"   - models/{scorer_file}")
+    if bundle_file is not None:
+        print(f"   - models/{bundle_file}")
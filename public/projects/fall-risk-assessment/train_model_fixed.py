@@ -1,42 +1,50 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, accuracy_score
+from sklearn.metrics import classification_report
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
+import argparse
 import joblib
 import json
+import os
+
+from dataset_io import load_dataset
+from evaluation import StreamingEvaluator
+from fast_scorer import export_bundle, export_scorer, load_serving_model, model_version
+from feature_encoder import DEFAULT_FEATURES, FeatureEncoder
+from importance import permutation_importance
+from instrumentation import StageTimer
+from model_search import successive_halving_search
+from risk_surface import PRECOMPUTED_SCORERS, load_surface
+from thresholds import (RiskBands, apply_calibration, choose_bands, evaluate_bands, fit_calibration,
+                        resolve_band_targets)
+from training_cache import TrainingCache, training_cache_key
 
 def prepare_features(df):
     """Prepare features for modeling - EXCLUDE risk_score to avoid leakage"""
     
-    feature_cols = [
-        'age', 'bmi', 'gait_speed', 'balance_score', 'muscle_strength',
-        'previous_falls', 'num_medications', 'takes_sedatives',
-        'takes_blood_pressure_meds', 'has_arthritis', 'has_osteoporosis',
-        'has_parkinsons', 'has_diabetes', 'vision_impairment',
-        'cognitive_score', 'uses_walking_aid', 'lives_alone',
-        'home_hazards', 'activity_level'
-    ]
-    
-    X = df[feature_cols].copy()
+    # Column order and gender encoding come from the shared feature schema
+    encoder = FeatureEncoder(DEFAULT_FEATURES)
+    X = encoder.encode(df, dtype=np.float64)
     
-    # Add gender encoding
-    if 'gender' in df.columns:
-        X['gender_male'] = (df['gender'] == 'Male').astype(int)
-    
-    return X, feature_cols
+    return X, encoder.feature_names
 
-def train_models(X_train, y_train, X_test, y_test):
-    """Train multiple models and compare"""
+def build_models(rf_n_jobs=1):
+    """Candidate models with their fixed hyperparameters"""
     
-    models = {
+    return {
         'Random Forest': RandomForestClassifier(
             n_estimators=200, 
             max_depth=10,
             min_samples_split=10,
             random_state=42,
-            class_weight='balanced'
+            class_weight='balanced',
+            n_jobs=rf_n_jobs
         ),
         'Gradient Boosting': GradientBoostingClassifier(
             n_estimators=200,
@@ -44,6 +52,17 @@ def train_models(X_train, y_train, X_test, y_test):
             learning_rate=0.1,
             random_state=42
         ),
+        # Bins features into <=255 buckets and builds trees with OpenMP threads;
+        # scales to multi-million-row cohorts where the exact GB above cannot
+        'Histogram Gradient Boosting': HistGradientBoostingClassifier(
+            max_iter=500,
+            learning_rate=0.1,
+            max_leaf_nodes=31,
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=42
+        ),
         'Logistic Regression': LogisticRegression(
             max_iter=2000,
             random_state=42,
@@ -51,51 +70,143 @@ def train_models(X_train, y_train, X_test, y_test):
             C=0.1
         )
     }
+
+def fit_and_evaluate(model, X_train, y_train, X_test, y_test, n_threads=None, trace_memory=True):
+    """Fit one candidate and compute its test-set metrics, timing each step"""
     
-    results = {}
+    timer = StageTimer(trace_memory=trace_memory)
     
-    for name, model in models.items():
-        print(f"\n🤖 Training {name}...")
+    # Cap OpenMP/BLAS threads so concurrent candidates don't oversubscribe cores
+    with timer.stage('fit'), threadpool_limits(limits=n_threads):
         model.fit(X_train, y_train)
-        
-        # Predictions
+    
+    # Predictions
+    with timer.stage('predict'):
         y_pred = model.predict(X_test)
         y_pred_proba = model.predict_proba(X_test)[:, 1]
-        
-        # Metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        auc = roc_auc_score(y_test, y_pred_proba)
-        
-        # Confusion matrix
-        tn, fp, fn, tp = confusion_matrix(y_test, y_pred).ravel()
-        sensitivity = tp / (tp + fn) if (tp + fn) > 0 else 0
-        specificity = tn / (tn + fp) if (tn + fp) > 0 else 0
-        
-        results[name] = {
-            'model': model,
-            'accuracy': accuracy,
-            'auc': auc,
-            'sensitivity': sensitivity,
-            'specificity': specificity,
-            'predictions': y_pred,
-            'probabilities': y_pred_proba
+    
+    # Accuracy, AUC and confusion counts in one pass over the predictions
+    with timer.stage('evaluate'):
+        evaluator = StreamingEvaluator().update(y_test, y_pred_proba)
+        metrics = evaluator.metrics()
+    
+    return {
+        'model': model,
+        'accuracy': metrics['accuracy'],
+        'auc': metrics['auc'],
+        'sensitivity': metrics['sensitivity'],
+        'specificity': metrics['specificity'],
+        'evaluator': evaluator,
+        'predictions': y_pred,
+        'probabilities': y_pred_proba,
+        'timings': timer.records
+    }
+
+def out_of_fold_probabilities(model, X, y, n_folds=5, n_threads=None, seed=42):
+    """
+    Each training row's probability from a copy of model fitted without its fold
+    
+    Calibration and band cut-offs are fitted on these, so the test set is
+    used for nothing but the reported metrics.
+    """
+    
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    with threadpool_limits(limits=n_threads):
+        return cross_val_predict(clone(model), X, y, cv=folds, method='predict_proba')[:, 1]
+
+def train_models(X_train, y_train, X_test, y_test, cpu_budget=None, trace_memory=True):
+    """
+    Train multiple models concurrently and compare
+    
+    Each candidate is fitted in its own worker process. Whatever cores are
+    left in cpu_budget are split between Random Forest (parallel trees) and
+    Histogram Gradient Boosting (threaded histogram building).
+    """
+    
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    n_models = len(build_models())
+    spare = max(0, cpu_budget - n_models)
+    models = build_models(rf_n_jobs=1 + spare // 2)
+    threads = {name: 1 for name in models}
+    threads['Histogram Gradient Boosting'] = 1 + spare - spare // 2
+    
+    for name in models:
+        print(f"\n🤖 Training {name}...")
+    
+    if cpu_budget == 1:
+        results = {
+            name: fit_and_evaluate(model, X_train, y_train, X_test, y_test, threads[name], trace_memory)
+            for name, model in models.items()
         }
-        
-        print(f"✅ Accuracy: {accuracy:.3f}")
-        print(f"✅ AUC: {auc:.3f}")
-        print(f"✅ Sensitivity (Recall): {sensitivity:.3f}")
-        print(f"✅ Specificity: {specificity:.3f}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_models, cpu_budget)) as pool:
+            futures = {
+                name: pool.submit(fit_and_evaluate, model, X_train, y_train, X_test, y_test, threads[name], trace_memory)
+                for name, model in models.items()
+            }
+            # Keep the candidates' original order so best-model ties resolve the same way
+            results = {name: future.result() for name, future in futures.items()}
+    
+    for name, result in results.items():
+        print(f"\n📋 {name}")
+        print(f"✅ Accuracy: {result['accuracy']:.3f}")
+        print(f"✅ AUC: {result['auc']:.3f}")
+        print(f"✅ Sensitivity (Recall): {result['sensitivity']:.3f}")
+        print(f"✅ Specificity: {result['specificity']:.3f}")
     
     return results
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train and select the fall risk model")
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help="Cores to use for training (default: all)")
+    parser.add_argument('--search', action='store_true',
+                        help="Pick the model with a cross-validated successive-halving search")
+    parser.add_argument('--search-grid', default=None,
+                        help="JSON file mapping model family -> {param: [values]}")
+    parser.add_argument('--cv-folds', type=int, default=5,
+                        help="Folds of the search and of the out-of-fold calibration predictions")
+    parser.add_argument('--search-cache', default='models/search_cache.jsonl',
+                        help="Fold results cache; an interrupted search resumes from it")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always retrain, even if an identical run is cached")
+    parser.add_argument('--cache-dir', default='models/.train_cache')
+    parser.add_argument('--cache-max-mb', type=float, default=512,
+                        help="Size cap of the training cache (least recently used runs are evicted)")
+    parser.add_argument('--n-bootstrap', type=int, default=1000,
+                        help="Bootstrap resamples for the metric confidence intervals")
+    parser.add_argument('--importance-repeats', type=int, default=10,
+                        help="Shuffles per feature for permutation importance")
+    parser.add_argument('--importance-max-samples', type=int, default=10_000,
+                        help="Test rows used for permutation importance")
+    parser.add_argument('--band-targets', default=None,
+                        help="JSON file mapping band family (risk, urgency) -> [[metric, target], ...], "
+                             "one target per cut-off (see thresholds.BAND_TARGETS)")
+    parser.add_argument('--run-log', default='models/training_runs.jsonl',
+                        help="Per-stage timings of every run are appended here")
+    parser.add_argument('--no-trace-memory', action='store_true',
+                        help="Skip per-stage peak memory (off-Linux it uses tracemalloc, which slows training)")
+    surface = parser.add_mutually_exclusive_group()
+    surface.add_argument('--risk-surface', action='store_true',
+                         help="Precompute the simulator surface for tree models too (minutes; "
+                              "the app otherwise scores their simulator on demand)")
+    surface.add_argument('--no-risk-surface', action='store_true',
+                         help="Leave the simulator surface for the app to compute on first load")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    
     print("🏥 Fall Risk Assessment - Model Training (FIXED)")
     print("=" * 60)
     
+    timer = StageTimer(trace_memory=not args.no_trace_memory)
+    
     # Load data
     print("\n📂 Loading data...")
-    train_df = pd.read_csv('data/fall_risk_train.csv')
-    test_df = pd.read_csv('data/fall_risk_test.csv')
+    with timer.stage('load'):
+        train_df = load_dataset('data/fall_risk_train.csv')
+        test_df = load_dataset('data/fall_risk_test.csv')
     
     print(f"   Training samples: {len(train_df)}")
     print(f"   Test samples: {len(test_df)}")
@@ -104,22 +215,93 @@ if __name__ == "__main__":
     
     # Prepare features
     print("\n🔧 Preparing features...")
-    X_train, feature_cols = prepare_features(train_df)
-    X_test, _ = prepare_features(test_df)
+    with timer.stage('prepare_features'):
+        X_train, feature_names = prepare_features(train_df)
+        X_test, _ = prepare_features(test_df)
     
     y_train = train_df['actual_fall_6months']
     y_test = test_df['actual_fall_6months']
     
-    print(f"   Features: {len(X_train.columns)}")
+    print(f"   Features: {len(feature_names)}")
     
     # Scale features
     print("\n⚖️  Scaling features...")
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    with timer.stage('scale'):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
     
-    # Train models
-    results = train_models(X_train_scaled, y_train, X_test_scaled, y_test)
+    # Train and evaluate models (or reuse an identical cached run)
+    grids = None
+    if args.search and args.search_grid:
+        with open(args.search_grid) as f:
+            grids = json.load(f)
+    band_targets = None
+    if args.band_targets:
+        with open(args.band_targets) as f:
+            try:
+                band_targets = resolve_band_targets(json.load(f))
+            except ValueError as e:
+                raise SystemExit(f"❌ {args.band_targets}: {e}")
+    
+    # A hit skips every stage up to saving: training, bootstrap, calibration
+    # and bands, and permutation importance, so the key covers their settings
+    settings = {
+        'cv_folds': args.cv_folds,
+        'n_bootstrap': args.n_bootstrap,
+        'band_targets': band_targets,
+        'importance_repeats': args.importance_repeats,
+        'importance_max_samples': args.importance_max_samples
+    }
+    if args.search:
+        settings.update(search=True, grids=grids)
+    cache = TrainingCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 ** 2))
+    cache_key = training_cache_key(
+        [X_train_scaled, y_train.to_numpy(), X_test_scaled, y_test.to_numpy()],
+        feature_names,
+        build_models(),
+        extra=settings
+    )
+    cached = None if args.no_cache else cache.get(cache_key)
+    
+    if cached is not None:
+        print(f"\n♻️  Reusing cached training run {cache_key[:12]}")
+        run = cached
+    else:
+        search_summary = None
+        if args.search:
+            print("\n🔎 Running cross-validated hyperparameter search...")
+            with timer.stage('search'):
+                search_summary = successive_halving_search(
+                    X_train_scaled, y_train.to_numpy(), build_models(),
+                    grids=grids,
+                    n_folds=args.cv_folds,
+                    workers=args.cpu_budget,
+                    cache_path=args.search_cache
+                )
+            for round_info in search_summary['rounds']:
+                print(f"   Round {round_info['round']}: {round_info['n_candidates']} candidates "
+                      f"on {round_info['resources']} rows/fold, best CV AUC {round_info['best_cv_auc']:.3f}")
+        
+            winner = search_summary['best_family']
+            print(f"   Winner: {winner} {search_summary['best_params']}")
+            print(f"   CV AUC: {search_summary['cv_auc_mean']:.3f} ± {search_summary['cv_auc_std']:.3f}")
+        
+            # Refit the winner on the full training set and score it on the test set
+            model = build_models(rf_n_jobs=args.cpu_budget or -1)[winner].set_params(**search_summary['best_params'])
+            with timer.stage('refit'):
+                results = {winner: fit_and_evaluate(model, X_train_scaled, y_train, X_test_scaled, y_test,
+                                                    n_threads=args.cpu_budget,
+                                                    trace_memory=timer.trace_memory)}
+        else:
+            with timer.stage('train'):
+                results = train_models(X_train_scaled, y_train, X_test_scaled, y_test,
+                                       cpu_budget=args.cpu_budget, trace_memory=timer.trace_memory)
+        # Each candidate's fit/predict/evaluate, measured where it ran
+        for name, result in results.items():
+            timer.add(result['timings'], prefix=f"{name}: ", depth=1)
+        run = {'results': results, 'search_summary': search_summary}
+    results, search_summary = run['results'], run['search_summary']
     
     # Select best model (by AUC)
     best_model_name = max(results, key=lambda x: results[x]['auc'])
@@ -133,6 +315,18 @@ if __name__ == "__main__":
     print(f"   Sensitivity: {results[best_model_name]['sensitivity']:.3f}")
     print(f"   Specificity: {results[best_model_name]['specificity']:.3f}")
     
+    # Uncertainty of the test-set metrics
+    evaluator = results[best_model_name]['evaluator']
+    if cached is None:
+        with timer.stage('bootstrap'):
+            run['intervals'] = evaluator.bootstrap(n_bootstrap=args.n_bootstrap, workers=args.cpu_budget)
+    intervals = run['intervals']
+    print(f"\n📐 {intervals['level']:.0%} bootstrap intervals ({intervals['n_bootstrap']} resamples):")
+    for name, label in [('accuracy', 'Accuracy'), ('auc', 'AUC'),
+                        ('sensitivity', 'Sensitivity'), ('specificity', 'Specificity')]:
+        low, high = intervals[name]
+        print(f"   {label}: {low:.3f} – {high:.3f}")
+    
     # Detailed classification report
     print(f"\n📊 Detailed Classification Report:")
     print(classification_report(
@@ -141,48 +335,126 @@ if __name__ == "__main__":
         target_names=['No Fall', 'Fall']
     ))
     
+    # Calibration map and risk/urgency bands from out-of-fold training
+    # predictions; the test set only checks the operating points they give
+    if cached is None:
+        with timer.stage('calibration'):
+            oof_probabilities = out_of_fold_probabilities(best_model, X_train_scaled, y_train,
+                                                          n_folds=args.cv_folds, n_threads=args.cpu_budget)
+            calibration = fit_calibration(y_train, oof_probabilities)
+            calibration['fitted_on'] = f"{args.cv_folds}-fold out-of-fold training predictions"
+            risk_bands = choose_bands(y_train, apply_calibration(calibration, oof_probabilities), band_targets)
+            test_points = evaluate_bands(risk_bands, y_test,
+                                         apply_calibration(calibration, results[best_model_name]['probabilities']))
+            for family, points in test_points.items():
+                risk_bands[family]['test_operating_points'] = points
+        run.update(calibration=calibration, risk_bands=risk_bands)
+    calibration, risk_bands = run['calibration'], run['risk_bands']
+    print(f"\n🎚️  Calibrated bands (Platt, fitted on {calibration['fitted_on']}; test set in brackets):")
+    for family, band in risk_bands.items():
+        for label, point, test in zip(band['labels'][1:], band['operating_points'], band['test_operating_points']):
+            status = '✓' if point['met'] else '✗'
+            print(f"   {family} → {label} at p ≥ {point['threshold']:.3f} "
+                  f"({point['target']} {status}: sens {point['sensitivity']:.3f} [{test['sensitivity']:.3f}], "
+                  f"spec {point['specificity']:.3f} [{test['specificity']:.3f}])")
+    
     # Confusion Matrix
-    cm = confusion_matrix(y_test, results[best_model_name]['predictions'])
+    counts = evaluator.metrics()
     print(f"\n📈 Confusion Matrix:")
     print(f"                Predicted")
     print(f"              No Fall  Fall")
-    print(f"Actual No Fall   {cm[0][0]:4d}   {cm[0][1]:4d}")
-    print(f"       Fall      {cm[1][0]:4d}   {cm[1][1]:4d}")
-    
-    # Feature importance (for tree-based models)
-    if hasattr(best_model, 'feature_importances_'):
-        feature_importance = pd.DataFrame({
-            'feature': X_train.columns,
-            'importance': best_model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        print(f"\n🔍 Top 10 Most Important Features:")
-        print(feature_importance.head(10).to_string(index=False))
+    print(f"Actual No Fall   {counts['tn']:4d}   {counts['fp']:4d}")
+    print(f"       Fall      {counts['fn']:4d}   {counts['tp']:4d}")
+    
+    # Permutation importance for every candidate, sharing the same shuffles
+    if cached is None:
+        with timer.stage('importance'):
+            run['importance'] = permutation_importance(
+                {name: result['model'] for name, result in results.items()},
+                X_test_scaled, y_test, feature_names,
+                n_repeats=args.importance_repeats,
+                max_samples=args.importance_max_samples,
+                workers=args.cpu_budget
+            )
+        cache.put(cache_key, run)
+    importance = run['importance']
+    feature_importance = pd.DataFrame({
+        'feature': feature_names,
+        'auc_drop': importance['models'][best_model_name]['mean'],
+        'std': importance['models'][best_model_name]['std']
+    }).sort_values('auc_drop', ascending=False)
+    
+    print(f"\n🔍 Top 10 Most Important Features (permutation, AUC drop):")
+    print(feature_importance.head(10).to_string(index=False))
     
     # Save model and scaler
     print(f"\n💾 Saving model artifacts...")
-    joblib.dump(best_model, 'models/fall_risk_model.pkl')
-    joblib.dump(scaler, 'models/scaler.pkl')
+    with timer.stage('save'):
+        joblib.dump(best_model, 'models/fall_risk_model.pkl')
+        joblib.dump(scaler, 'models/scaler.pkl')
+        # NumPy-only scorer with the scaler folded in (linear models only)
+        scorer_file = export_scorer(best_model, scaler, feature_names)
+        
+        # Save feature names
+        with open('models/feature_names.json', 'w') as f:
+            json.dump(feature_names, f)
+        
+        # Save model metadata
+        metadata = {
+            'model_type': best_model_name,
+            'accuracy': float(results[best_model_name]['accuracy']),
+            'auc': float(results[best_model_name]['auc']),
+            'sensitivity': float(results[best_model_name]['sensitivity']),
+            'specificity': float(results[best_model_name]['specificity']),
+            'n_features': len(feature_names),
+            'training_samples': len(X_train),
+            'test_samples': len(X_test),
+            'feature_names': feature_names
+        }
+        if scorer_file is not None:
+            metadata['scorer_file'] = scorer_file
+        
+        # Only what the model is: timings, memory and the cache key of this
+        # run go to the run log, so an identical retrain ships identical files
+        if search_summary is not None:
+            metadata['search'] = search_summary
+        metadata['confidence_intervals'] = intervals
+        metadata['calibration'] = calibration
+        metadata['risk_bands'] = risk_bands
+        metadata['permutation_importance'] = importance
+        
+        # Single memory-mappable file with everything the app needs
+        bundle_file = export_bundle(best_model, scaler, feature_names, metadata)
+        if bundle_file is not None:
+            metadata['bundle_file'] = bundle_file
+        
+        with open('models/metadata.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
     
-    # Save feature names
-    with open('models/feature_names.json', 'w') as f:
-        json.dump(list(X_train.columns), f)
+    # Score the simulator grid now, exactly as the app would load it, so the
+    # first dashboard session after a retrain doesn't pay for it. A retrain
+    # to an identical model keeps its version and reuses the cached surface
+    serving_scorer, serving_metadata = load_serving_model('models')
+    version = model_version(serving_scorer, serving_metadata)
+    build_surface = args.risk_surface or (not args.no_risk_surface and
+                                          getattr(serving_scorer, 'bundle_type', None) in PRECOMPUTED_SCORERS)
+    if build_surface:
+        print(f"\n🗺️  Precomputing the risk simulator surface...")
+        with timer.stage('risk_surface'):
+            load_surface('models/risk_surface', version, serving_scorer,
+                         FeatureEncoder(serving_scorer.feature_names),
+                         RiskBands.from_metadata(serving_metadata), build=True)
     
-    # Save model metadata
-    metadata = {
+    timer.write_log(args.run_log, {
+        'cache_key': cache_key,
+        'model_version': version,
+        'cached': cached is not None,
         'model_type': best_model_name,
-        'accuracy': float(results[best_model_name]['accuracy']),
-        'auc': float(results[best_model_name]['auc']),
-        'sensitivity': float(results[best_model_name]['sensitivity']),
-        'specificity': float(results[best_model_name]['specificity']),
-        'n_features': len(X_train.columns),
         'training_samples': len(X_train),
-        'test_samples': len(X_test),
-        'feature_names': list(X_train.columns)
-    }
-    
-    with open('models/metadata.json', 'w') as f:
-        json.dump(metadata, f, indent=2)
+        'test_samples': len(X_test)
+    })
+    print(f"\n⏱️  Stage timings (slowest: {timer.summary()['slowest_stage']}):")
+    timer.report()
     
     print("\n✅ Model training complete!")
     print("📁 Files saved:")
@@ -190,5 +462,10 @@ if __name__ == "__main__":
     print("   ✓ models/scaler.pkl")
     print("   ✓ models/feature_names.json")
     print("   ✓ models/metadata.json")
+    print(f"   ✓ {args.run_log} (appended)")
+    if scorer_file is not None:
+        print(f"   ✓ models/{scorer_file}")
+    if bundle_file is not None:
+        print(f"   ✓ models/{bundle_file}")
     
     print(f"\n🎯 Model is ready for deployment!")
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+# Parameters that change how fast a model trains, not what it learns
+RUNTIME_PARAMS = {'n_jobs', 'verbose'}
+
+# Bumped whenever the cached results structure changes, so old entries miss
+RESULTS_FORMAT = 4
+
+def library_versions():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__
+    }
+
+def model_config(models):
+    """JSON-able hyperparameters of every candidate"""
+    return {
+        name: {
+            key: value for key, value in sorted(model.get_params().items())
+            if key not in RUNTIME_PARAMS
+        }
+        for name, model in models.items()
+    }
+
+def training_cache_key(arrays, feature_names, models, extra=None):
+    """
+    Content hash of one training run
+
+    Covers the input arrays (bytes, dtype and shape), the feature list, every
+    candidate's hyperparameters, library versions and any extra settings.
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(array.tobytes())
+
+    config = {
+        'feature_names': list(feature_names),
+        'models': model_config(models),
+        'versions': library_versions(),
+        'results_format': RESULTS_FORMAT,
+        'extra': extra or {}
+    }
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+class TrainingCache:
+    """Fitted models and evaluation results stored by run key, with LRU eviction"""
+
+    def __init__(self, cache_dir='models/.train_cache', max_bytes=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key, 'results.pkl')
+
+    def get(self, key):
+        """
+        Cached results for key, or None; a hit marks the entry as recently used
+
+        An entry that cannot be loaded (truncated, or pickled by an
+        incompatible library) is deleted and treated as a miss.
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            results = joblib.load(path)
+        except Exception:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            return None
+        os.utime(path)
+        return results
+
+    def put(self, key, results):
+        """Store results for key, then evict least recently used entries over the cap"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written beside the entry and renamed into place, so an interrupted
+        # write never leaves a partial results.pkl behind
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            joblib.dump(results, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict(keep=key)
+
+    def entries(self):
+        """(last_used, size, key) for every complete entry, oldest first"""
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for key in os.listdir(self.cache_dir):
+                path = self.path(key)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, key))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= size
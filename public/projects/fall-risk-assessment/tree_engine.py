@@ -0,0 +1,265 @@
+import time
+
+import numpy as np
+
+class TreeEnsembleScorer:
+    """
+    Random Forest / Gradient Boosting flattened into contiguous node arrays
+
+    All trees share one set of arrays (feature, threshold, children, value);
+    each tree starts at its entry in roots. Leaves point to themselves, so a
+    batch is scored by stepping every (tree, row) pair down one level at a
+    time for max_depth steps, with no per-tree Python loop. Needs only NumPy.
+    """
+
+    scorer_file = 'tree_scorer.npz'
+    bundle_type = 'tree'
+
+    def __init__(self, kind, feature, threshold, children, value, roots, max_depth,
+                 feature_names, mean, scale, base_score=0.0, learning_rate=1.0,
+                 value_offset=None, value_step=None):
+        self.kind = kind
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold)
+        # (n_nodes, 2) left/right child pairs, flattened so child = children[2 * node + go_right]
+        self.children = np.ascontiguousarray(children, dtype=np.int32).reshape(-1)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.base_score = float(base_score)
+        self.learning_rate = float(learning_rate)
+        # Set when leaf values are quantized to uint16
+        self.value_offset = value_offset
+        self.value_step = value_step
+        self.coef = None
+
+        if len(self.mean) != len(self.feature_names):
+            raise ValueError(
+                f"Scaler has {len(self.mean)} features, schema has {len(self.feature_names)}"
+            )
+        if len(self.feature) and self.feature.max() >= len(self.feature_names):
+            raise ValueError("Trees reference features outside the schema")
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_names, dtype=np.float64, quantize=False):
+        """
+        Flatten a fitted RandomForestClassifier or GradientBoostingClassifier
+
+        dtype=np.float32 halves the threshold/leaf arrays; thresholds are
+        rounded down so every split still matches sklearn's (float32 inputs)
+        and only leaf values lose precision. quantize=True also stores leaf
+        values as uint16.
+        """
+        name = type(model).__name__
+        if name == 'RandomForestClassifier':
+            kind = 'forest'
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            base_score, learning_rate = 0.0, 1.0 / len(trees)
+        elif name == 'GradientBoostingClassifier':
+            kind = 'boosting'
+            trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+            prior = model.init_.class_prior_[1]
+            base_score, learning_rate = np.log(prior / (1 - prior)), model.learning_rate
+        else:
+            raise ValueError(f"Cannot flatten {name}")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            index = np.arange(tree.node_count, dtype=np.int32) + offset
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            children.append(np.column_stack([
+                np.where(is_leaf, index, tree.children_left + offset),
+                np.where(is_leaf, index, tree.children_right + offset)
+            ]))
+            if kind == 'forest':
+                counts = tree.value[:, 0, :]
+                values.append(counts[:, 1] / counts.sum(axis=1))
+            else:
+                values.append(tree.value[:, 0, 0])
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        threshold = np.concatenate(thresholds)
+        if dtype == np.float32:
+            # x <= t for float32 x exactly when x <= the largest float32 not above t
+            rounded = threshold.astype(np.float32)
+            threshold = np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+        value = np.concatenate(values)
+        value_offset = value_step = None
+        if quantize:
+            value_offset = float(value.min())
+            value_step = float(value.max() - value.min()) / 65535 or 1.0
+            value = np.round((value - value_offset) / value_step).astype(np.uint16)
+        else:
+            value = value.astype(dtype)
+
+        return cls(
+            kind,
+            np.concatenate(features), threshold.astype(dtype), np.concatenate(children), value,
+            roots, max_depth, feature_names, scaler.mean_, scaler.scale_,
+            base_score, learning_rate, value_offset, value_step
+        )
+
+    def save(self, path):
+        extra = {}
+        if self.value_step is not None:
+            extra = {'value_offset': np.array([self.value_offset]), 'value_step': np.array([self.value_step])}
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            feature=self.feature, threshold=self.threshold,
+            children=self.children, value=self.value, roots=self.roots,
+            max_depth=np.array([self.max_depth]),
+            feature_names=np.array(self.feature_names),
+            mean=self.mean, scale=self.scale,
+            base_score=np.array([self.base_score]),
+            learning_rate=np.array([self.learning_rate]),
+            **extra
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            quantized = 'value_step' in data
+            return cls(
+                str(data['kind']),
+                data['feature'], data['threshold'], data['children'], data['value'], data['roots'], data['max_depth'][0],
+                data['feature_names'].tolist(), data['mean'], data['scale'],
+                data['base_score'][0], data['learning_rate'][0],
+                float(data['value_offset'][0]) if quantized else None,
+                float(data['value_step'][0]) if quantized else None
+            )
+
+    def bundle_state(self):
+        """(params, arrays) stored in a model bundle; the scaler lives at bundle level"""
+        params = {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'base_score': self.base_score,
+            'learning_rate': self.learning_rate,
+            'value_offset': self.value_offset,
+            'value_step': self.value_step
+        }
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold,
+            'children': self.children, 'value': self.value, 'roots': self.roots
+        }
+        return params, arrays
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        params = bundle.params
+        return cls(
+            params['kind'],
+            bundle.array('feature'), bundle.array('threshold'), bundle.array('children'),
+            bundle.array('value'), bundle.array('roots'), params['max_depth'],
+            bundle.feature_names, bundle.array('scaler_mean'), bundle.array('scaler_scale'),
+            params['base_score'], params['learning_rate'],
+            params['value_offset'], params['value_step']
+        )
+
+    def leaf_values(self, nodes):
+        values = self.value.take(nodes)
+        if self.value_step is not None:
+            return self.value_offset + values * self.value_step
+        return values
+
+    def raw_score(self, X_scaled):
+        """Sum of leaf values over all trees (times learning rate, plus base)"""
+        n_rows, n_features = X_scaled.shape
+        # sklearn trees compare float32 features against the thresholds
+        X_flat = np.ascontiguousarray(X_scaled, dtype=np.float32).ravel()
+
+        # Tree-major (n_trees, n_rows) so each tree's nodes stay in cache across rows
+        nodes = np.repeat(self.roots, n_rows).reshape(len(self.roots), n_rows)
+        row_offset = (np.arange(n_rows, dtype=np.int32) * n_features)[None, :]
+        for _ in range(self.max_depth):
+            x = X_flat.take(self.feature.take(nodes) + row_offset)
+            nodes = self.children.take(2 * nodes + (x > self.threshold.take(nodes)))
+
+        return self.base_score + self.learning_rate * self.leaf_values(nodes).sum(axis=0)
+
+    def predict_risk(self, X, chunk_rows=None):
+        """Fall probability for a feature vector (scalar) or matrix (1-D array)"""
+        X = np.asarray(X, dtype=np.float64)
+        single = X.ndim == 1
+        X = X.reshape(-1, len(self.feature_names))
+        X_scaled = (X - self.mean) / self.scale
+
+        # Keep the (trees x rows) node matrix small enough to stay in cache
+        chunk_rows = chunk_rows or max(1, 2 ** 16 // len(self.roots))
+        raw = np.concatenate([
+            self.raw_score(X_scaled[start:start + chunk_rows])
+            for start in range(0, len(X_scaled), chunk_rows)
+        ]) if len(X_scaled) else np.empty(0)
+
+        if self.kind == 'boosting':
+            proba = np.exp(-np.logaddexp(0, -raw))
+        else:
+            proba = raw
+        return proba[0] if single else proba
+
+if __name__ == "__main__":
+    # Benchmark the flattened engine against sklearn and check agreement
+    from sklearn.preprocessing import StandardScaler
+
+    from dataset_io import load_dataset
+    from generate_data_improved import generate_fall_risk_data_columnar
+    from train_model_fixed import build_models, prepare_features
+
+    print("🌲 Flattened tree engine vs sklearn")
+    print("=" * 60)
+
+    train_df = load_dataset('data/fall_risk_train.csv')
+    test_df = load_dataset('data/fall_risk_test.csv')
+    X_train, feature_names = prepare_features(train_df)
+    X_test, _ = prepare_features(test_df)
+    scaler = StandardScaler().fit(X_train)
+    X_big, _ = prepare_features(generate_fall_risk_data_columnar(1_000_000, rng=np.random.default_rng(0)))
+
+    for name in ['Random Forest', 'Gradient Boosting']:
+        model = build_models(rf_n_jobs=1)[name]
+        model.fit(scaler.transform(X_train), train_df['actual_fall_6months'])
+        reference = model.predict_proba(scaler.transform(X_test))[:, 1]
+
+        print(f"\n🤖 {name}")
+        for label, options, tolerance in [('float64', {}, 1e-9),
+                                          ('float32', {'dtype': np.float32}, 1e-5),
+                                          ('quantized', {'dtype': np.float32, 'quantize': True}, 1e-3)]:
+            engine = TreeEnsembleScorer.from_sklearn(model, scaler, feature_names, **options)
+            error = np.abs(engine.predict_risk(X_test) - reference).max()
+            status = '✅' if error <= tolerance else '❌'
+            print(f"   {status} {label:9s} max |Δp| vs sklearn: {error:.2e} (tolerance {tolerance:g}), "
+                  f"{engine.value.nbytes + engine.threshold.nbytes:,} bytes")
+
+        engine = TreeEnsembleScorer.from_sklearn(model, scaler, feature_names)
+        row = X_test[0]
+
+        start = time.perf_counter()
+        for _ in range(200):
+            model.predict_proba(scaler.transform(row.reshape(1, -1)))[:, 1]
+        sklearn_single = (time.perf_counter() - start) / 200
+        start = time.perf_counter()
+        for _ in range(200):
+            engine.predict_risk(row)
+        engine_single = (time.perf_counter() - start) / 200
+        print(f"   single row: sklearn {sklearn_single*1e6:,.0f} us, engine {engine_single*1e6:,.0f} us")
+
+        start = time.perf_counter()
+        model.predict_proba(scaler.transform(X_big))
+        sklearn_batch = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.predict_risk(X_big)
+        engine_batch = time.perf_counter() - start
+        print(f"   1M rows:    sklearn {sklearn_batch:.2f}s, engine {engine_batch:.2f}s")